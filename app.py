@@ -1,28 +1,18 @@
-import streamlit as st
-import argparse
+import os
 import pandas as pd
-import random
-from player import Player
-from team import Team
-import collections
-import sys
+import streamlit as st
+from client import solve_remote
+from player import PlayerTable
+from observers import Observer
+from player_cache import load_player_pool
+from result_cache import ELITE_COUNT, ResultCache, run_settings
+from solver import SquadSolver, StoppingCriteria, formations, parse_specific_players
 
-st.title("FIFA 23 Ultimate Team Squad Generator")
+# When set, squads are solved by a running service.py and this page only sends requests
+SERVICE_URL = os.environ.get('SQUAD_SERVICE_URL')
 
+st.title("FIFA 23 Ultimate Team Squad Generator")
 
-formations = {
-        '4-4-2': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'LM': 1, 'CM': 2, 'RM': 1, 'ST': 2},
-        '4-2-4': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'LW': 1, 'CM': 2, 'RW': 1, 'ST': 2},
-        '4-3-3': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 3, 'LW': 1, 'RW': 1, 'ST': 1},
-        '3-5-2': {'GK': 1, 'CB': 3, 'LM': 1, 'RM': 1, 'CDM': 2, 'CAM': 1, 'ST': 2},
-        '4-2-3-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CDM': 2, 'CAM': 3 ,'ST': 1},
-        '4-5-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 1, 'CDM': 2, 'LM': 1, 'RM': 1, 'ST': 1},
-        '4-1-4-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CDM': 1, 'LM': 1, 'CM': 2, 'RM': 1, 'ST': 1},
-        '5-3-2': {'GK': 1, 'CB': 3, 'LB': 1, 'RB': 1, 'CM': 3, 'ST': 2},
-        '5-4-1': {'GK': 1, 'CB': 3, 'LB': 1, 'RB': 1, 'LM': 1, 'CM': 2, 'RM': 1, 'ST': 1},
-        '4-3-2-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 3, 'CF': 2, 'ST': 1},
-        '4-3-3_4': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 2, 'CAM': 1, 'LW': 1, 'RW': 1, 'ST': 1},
-    }
 
 budget = st.slider("Budget", min_value=1000000, max_value=10000000, value=5000000, step=100000)
 formation = st.selectbox("Formation", list(formations.keys()), index=list(formations.keys()).index('4-4-2'))
@@ -30,177 +20,123 @@ min_chemistry = st.slider("Minimum Chemistry", min_value=0, max_value=33, value=
 greatest_squad = st.checkbox("Generate Greatest Squad", help="Generates the squad with the highest total rating and no matter the cost.")
 legend_squad = st.checkbox("Generate Legend Squad")
 specific_players = st.text_input("Specific Players (DAId:position pairs, separated by spaces)")
-
-
-POPULATION_SIZE = 100
-BUDGET = budget
-FORMATION = formations[formation]
-MIN_CHEMISTRY = min_chemistry
-if MIN_CHEMISTRY < 0 or MIN_CHEMISTRY > 33:
-    raise ValueError("Minimum chemistry must be between 0 and 33 inclusive.")
-
-specific_players_info = {int(player.split(':')[0]): player.split(':')[1] for player in specific_players.split()} if specific_players else {}
-
-df = pd.read_excel('players_price_update.xlsx')
-players = [Player(row) for index, row in df.iterrows() if row["Cost"] > 15000]
-
-specific_players = {player.DAId: player for player in players if player.DAId in specific_players_info.keys()}
-players = [player for player in players if player.DAId not in specific_players_info.keys()]
-
-specific_players_cost = sum(player.cost for player in specific_players.values())
-
-if greatest_squad:
-    players = [player for player in players if any(score > 98 for score in player.performance_scores.values())]
-    MIN_CHEMISTRY = 29
-else:
-    BUDGET = budget
-
-all_positions = set()
-for player in players:
-    all_positions.add(player.main_position)
-    all_positions.update(player.alt_positions)
-
-data = {position: [] for position in all_positions}
-
-for player in players:
-    for position in [player.main_position] + list(player.alt_positions):
-        data[position].append(player)
-
-if greatest_squad:
-    min_score = 98.75
-elif legend_squad:
-    min_score = 97
-else:
-    min_score = 89
-
-population = []
-while len(population) < POPULATION_SIZE:
-    players_list = []
-    already_chosen_player_names = []
-
-    for DAId, player in specific_players.items():
-        player.selected_position = specific_players_info[DAId]
-        already_chosen_player_names.append(player.name)
-        players_list.append(player)
-
-    for position, count in FORMATION.items():
-        if position in data:
-            available_players = [player for player in data[position] 
-                                if player.performance_scores[position] > min_score 
-                                and player.name not in already_chosen_player_names]
-            chosen_players = random.sample(available_players, k=count)
-            for player in chosen_players:
-                player.selected_position = position
-                already_chosen_player_names.append(player.name)
-            players_list.extend(chosen_players)
-        else:
-            print(f"No players can play the position {position}")
-            sys.exit()
-    team = Team(players_list)
-    if team.calculate_chemistry() >= MIN_CHEMISTRY:
-        population.append(team)
+with st.expander("Stopping criteria"):
+    generations = st.number_input("Maximum generations", min_value=1, value=1500, step=100)
+    patience = st.number_input("Stop after this many generations without improvement (0 = never)", min_value=0, value=0, step=50)
+    min_diversity = st.slider("Stop when the share of distinct squads falls below (0 = never)", min_value=0.0, max_value=1.0, value=0.0, step=0.05)
+    target_fitness = st.number_input("Stop once this fitness is reached (0 = never)", min_value=0.0, value=0.0, step=100.0)
+    time_limit = st.number_input("Time limit in seconds (0 = none)", min_value=0.0, value=0.0, step=5.0)
+
+
+specific_players_info = parse_specific_players(specific_players.split())
+
+
+class ChartObserver(Observer):
+    # passes each generation's fitness statistics to the live chart
+    def __init__(self, report):
+        self.report = report
+
+    def generation_finished(self, solver, stats):
+        self.report(stats['generation'], {'best': stats['best_fitness'], 'mean': stats['mean_fitness'], 'median': stats['median_fitness']})
+
+
+def solve_locally(report, show):
+    # Nothing is loaded or seeded until "Generate Squad" is pressed
+    pool = load_player_pool('players_price_update.xlsx')
+    config = dict(formation=formations[formation], budget=budget, min_chemistry=min_chemistry, specific_players_info=specific_players_info,
+                  greatest_squad=greatest_squad, legend_squad=legend_squad)
+
+    # Identical requests are answered from the result cache before any solver is built; close ones start from
+    # its stored squads
+    cache = ResultCache()
+    settings = run_settings(generations)
+    cached = cache.get(config, pool.data_version, settings)
+    if cached is not None:
+        return cached['result']
+    table = PlayerTable(pool, min_cost=15000)
+    solver = SquadSolver(table, **config, observers=[ChartObserver(report)])
+    solver.seed_population(cache.near(config, pool.data_version))
+
+    stopping = StoppingCriteria(patience or None, min_diversity or None, target_fitness or None, time_limit or None)
+    for generation, team in solver.solve_iter(generations, stopping=stopping):
+        show(dict(solver.summary(team), generations=generation))
+    best_team = solver.best_team()
+    result = solver.summary(best_team)
+    result.update(generations=solver.generations_run, stop_reason=solver.stop_reason)
+    if solver.generations_run == generations:  # runs stopped early aren't stored
+        cache.put(config, pool.data_version, result, solver.export_elites(solver.top_teams(ELITE_COUNT)), settings)
+    return result
+
+
+def solve_with_service(report, show):
+    request = dict(budget=budget, formation=formation, min_chemistry=min_chemistry, greatest_squad=greatest_squad,
+                   legend_squad=legend_squad, specific_players=specific_players_info, generations=generations,
+                   patience=patience or None, min_diversity=min_diversity or None,
+                   target_fitness=target_fitness or None, time_limit=time_limit or None)
+
+    def progress(event):
+        report(event['generation'], {'best': event['best_fitness']})
+        if 'squad' in event:
+            show(dict(event['squad'], generations=event['generation']))
+
+    return solve_remote(SERVICE_URL, request, progress)
+
+
+def show_team(placeholder, result):
+    with placeholder.container():
+        st.subheader("Best Team:")
+        st.table(pd.DataFrame([{'Position': player['position'], 'Name': player['name'], 'DA Score': player['score'], 'Cost': player['cost']}
+                               for player in result['team']]))
+        st.write(f"Total rating: {round(result['fitness'], 2)}, Total cost: {round(result['cost'], 2)}, Chemistry: {result['chemistry']} out of 33")
+
+
+generate_column, stop_column = st.columns(2)
+generate = generate_column.button("Generate Squad")
+# pressing Stop reruns the page, which interrupts the solve; the best squad found so far is kept in the session
+stop = stop_column.button("Stop")
 loading_message_placeholder = st.empty()
-progress_bar_placeholder = st.empty()
-if st.button("Generate Squad"):
+chart_placeholder = st.empty()
+team_placeholder = st.empty()
+if stop and 'best_so_far' in st.session_state:
+    best_so_far = st.session_state.pop('best_so_far')
+    st.caption(f"Stopped after generation {best_so_far['generations']}; showing the best squad found so far")
+    show_team(team_placeholder, best_so_far)
+if generate:
     loading_message_placeholder.text("Generating the ultimate squad... ⚽🌟")
-    progress_bar = progress_bar_placeholder.progress(0)
-    for generation in range(1500):
-        progress_bar.progress((generation + 1) / 1500)
-
+    chart = None
+    pending = []
+
+    def flush_chart():
+        # live fitness chart; rows are sent in batches to keep the page responsive
+        global chart
+        if not pending:
+            return
+        rows = pd.DataFrame(pending).set_index('generation')
+        if chart is None:
+            chart = chart_placeholder.line_chart(rows)
+        else:
+            chart.add_rows(rows)
+        pending.clear()
+
+    def report(generation, fitness):
+        pending.append({'generation': generation, **fitness})
+        if generation % 10 == 0:
+            flush_chart()
+            loading_message_placeholder.text(f"Generating the ultimate squad... ⚽🌟 (generation {generation} of {generations})")
         if generation % 100 == 0: print(f"Generation {generation}")
 
-        fitness_values = [team.fitness(BUDGET, MIN_CHEMISTRY, specific_players_cost) if team.calculate_chemistry() >= MIN_CHEMISTRY else 1500 for team in population]
-
-        parents = []
-        while len(parents) < POPULATION_SIZE:
-            parent = random.choices(population, weights=fitness_values, k=1)[0]
-            if parent.calculate_chemistry() >= MIN_CHEMISTRY:
-                parents.append(parent)
-
-        population = []
-        for parent1, parent2 in zip(parents[::2], parents[1::2]):
-            new_team_players = []
-            already_chosen_positions = collections.defaultdict(int)
-            new_team_players.extend(specific_players.values())
-            for player in specific_players.values():
-                already_chosen_positions[player.selected_position] += 1
-            for position, count in FORMATION.items():
-                if already_chosen_positions[position] >= count:
-                    continue
-                parent_choice = random.choice([parent1, parent2])
-                parent_players = [player for player in parent_choice.players 
-                    if player.selected_position == position 
-                    and player.performance_scores[position] > min_score
-                    and player.DAId not in specific_players.keys()]
-
-                selected_players = random.sample(parent_players, min(count - already_chosen_positions[position], len(parent_players)))
-
-                for player in selected_players:
-                    already_chosen_positions[player.selected_position] += 1
-                new_team_players.extend(selected_players)
-
-                if already_chosen_positions[position] < count:
-                    remaining_needed = count - already_chosen_positions[position]
-                    additional_players = [p for p in data[position] 
-                                        if p.DAId not in specific_players.keys()
-                                        and p.performance_scores[position] > min_score
-                                        and already_chosen_positions[p.selected_position] < count]
-
-                    additional_players = random.sample(additional_players, min(remaining_needed, len(additional_players)))
-
-                    for player in additional_players:
-                        already_chosen_positions[player.selected_position] += 1
-                    new_team_players.extend(additional_players)
-            new_team = Team(new_team_players)
-            if new_team.calculate_chemistry() >= MIN_CHEMISTRY:
-                population.append(new_team)
-
-        for i, team in enumerate(population):
-            if random.random() < 0.1:
-                old_player = random.choice([player for player in team.players if player.DAId not in specific_players.keys()])
-                if old_player.selected_position is None or old_player.selected_position not in data:
-                    continue
-
-                possible_replacements = [player for player in data[old_player.selected_position] if player != old_player and player.DAId not in specific_players.keys()]
-
-                if not greatest_squad:
-                    possible_replacements = [player for player in possible_replacements if player.cost <= old_player.cost]
-
-                possible_replacements.sort(key=lambda p: p.performance_scores[old_player.selected_position], reverse=True)
-
-                for new_player in possible_replacements:
-                    new_team_players = [new_player if player == old_player else player for player in team.players]
-                    new_team = Team(new_team_players)
-
-                    if new_team.fitness(None if greatest_squad else BUDGET, MIN_CHEMISTRY, specific_players_cost) > team.fitness(None if greatest_squad else BUDGET, MIN_CHEMISTRY, specific_players_cost) and new_team.calculate_chemistry() >= MIN_CHEMISTRY:
-                        population[i] = new_team
-                        break
-
-        if not greatest_squad:
-            for i, team in enumerate(population):
-                while team.cost() > BUDGET:
-                    expensive_players = [player for player in team.players if player.DAId not in specific_players.keys()]
-                    if not expensive_players: 
-                        break
-
-                    old_player = max(expensive_players, key=lambda p: p.cost) 
-
-                    possible_replacements = [player for player in players 
-                                            if player.cost < old_player.cost and player.cost > 0 
-                                            and (old_player.main_position == player.main_position or old_player.main_position in player.alt_positions)]
-                    if possible_replacements:
-                        new_player = random.choice(possible_replacements)
-                        team.players[team.players.index(old_player)] = new_player
-                    else:
-                        break
-
-        population = [team for team in population if len(set(player.name for player in team.players)) == len(team.players)]
+    def show(result):
+        # live team table, updated whenever the solver finds a better squad
+        st.session_state['best_so_far'] = result
+        show_team(team_placeholder, result)
+
+    try:
+        result = solve_with_service(report, show) if SERVICE_URL else solve_locally(report, show)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+    st.session_state.pop('best_so_far', None)
+    flush_chart()
     loading_message_placeholder.empty()
-    progress_bar_placeholder.empty()
-    best_team = max(population, key=lambda team: team.fitness(None if greatest_squad else BUDGET, MIN_CHEMISTRY+2, specific_players_cost))
-    st.subheader("Best Team:")
-    for position in FORMATION:
-        players_in_position = [player for player in best_team.players if player.selected_position == position]
-        for player in players_in_position:
-            st.write(f"{position}: {player.name} (DA Score: {player.performance_scores[player.selected_position]}, Cost: {player.cost})")
-    st.write(f"Total rating: {round(best_team.fitness(None if greatest_squad else BUDGET, MIN_CHEMISTRY), 2)}, Total cost: {round(best_team.cost(), 2)}, Chemistry: {best_team.calculate_chemistry()} out of 33")
+    st.caption(f"Finished after {result['generations']} generations: {result['stop_reason']}")
+    show_team(team_placeholder, result)
@@ -0,0 +1,145 @@
+import csv
+import json
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from player_cache import load_player_pool
+from result_cache import run_settings
+from solver import formations, parse_request
+from worker import evolve, init_worker
+
+# budgets of the default --grid: 1M to 10M in steps of 1M
+GRID_BUDGETS = [1000000 * k for k in range(1, 11)]
+
+# output columns, in order
+COLUMNS = ['name', 'formation', 'budget', 'min_chemistry', 'greatest_squad', 'legend_squad', 'specific_players',
+           'fitness', 'cost', 'chemistry', 'generations', 'stop_reason', 'cached', 'error', 'squad']
+
+
+def load_scenarios(path):
+    # A YAML (or JSON) file holding either a list of scenarios or {'defaults': {...}, 'scenarios': [...]}.
+    # Each scenario takes the same fields as a service request: formation, budget, min_chemistry, greatest_squad,
+    # legend_squad, specific_players, generations, seed, target_fitness, time_limit, ...
+    with open(path) as f:
+        if path.endswith('.json'):
+            data = json.load(f)
+        else:
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading YAML scenarios needs PyYAML: pip install pyyaml") from None
+            data = yaml.safe_load(f)
+    if isinstance(data, list):
+        data = {'scenarios': data}
+    defaults = data.get('defaults') or {}
+    return [{**defaults, **scenario} for scenario in data.get('scenarios') or []]
+
+
+def grid_scenarios(formation_names=None, budgets=None, **defaults):
+    # every formation at every budget
+    return [{**defaults, 'formation': formation, 'budget': budget}
+            for formation in formation_names or list(formations) for budget in budgets or GRID_BUDGETS]
+
+
+def _chain_key(scenario):
+    # scenarios differing only in budget (and run length) form a chain; each run there starts from the elites
+    # of the next cheaper one, since a squad that fits a lower budget also fits a higher one
+    config, _ = parse_request(scenario)
+    return json.dumps([sorted(config['formation'].items()), config['min_chemistry'], config['greatest_squad'],
+                       config['legend_squad'], sorted(config['specific_players_info'].items())])
+
+
+def run_batch(source_path, scenarios, generations=1500, workers=None, min_cost=15000, cache=None, callback=None):
+    # Solve every scenario on one process pool that loads the player pool once per worker.
+    # Chains run in parallel; within a chain, budgets run cheapest first and hand their elite squads on.
+    # Returns one row per scenario, in input order.
+    data_version = load_player_pool(source_path).data_version
+    scenarios = [{'generations': generations, **scenario} for scenario in scenarios]
+    rows = [None] * len(scenarios)
+
+    def finish(k, row):
+        rows[k] = row
+        if callback is not None:
+            callback(sum(row is not None for row in rows), len(rows), row)
+
+    chains = {}
+    for k, scenario in enumerate(scenarios):
+        try:
+            chains.setdefault(_chain_key(scenario), []).append(k)
+        except (ValueError, KeyError, TypeError) as e:
+            finish(k, _row(scenario, error=str(e)))
+    chains = [sorted(chain, key=lambda k: int(scenarios[k].get('budget', 5000000))) for chain in chains.values()]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(source_path, min_cost)) as executor:
+        pending = {}
+
+        def submit(chain, position, elites):
+            # start the next uncached scenario of a chain, finishing cached ones on the way
+            while position < len(chain):
+                k = chain[position]
+                config, options = parse_request(scenarios[k])
+                settings = run_settings(options['generations'], options['seed'])
+                cached = cache.get(config, data_version, settings) if cache is not None else None
+                if cached is None:
+                    if not elites and cache is not None:
+                        elites = cache.near(config, data_version)
+                    future = executor.submit(evolve, config, options['seed'], None, options['generations'],
+                                             options['target_fitness'], options['time_limit'], elites, data_version)
+                    pending[future] = (chain, position, config, settings)
+                    return
+                finish(k, _row(scenarios[k], cached['result'], cached=True))
+                elites = cached['elites']
+                position += 1
+
+        for chain in chains:
+            submit(chain, 0, None)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                chain, position, config, settings = pending.pop(future)
+                k = chain[position]
+                try:
+                    result = future.result()
+                except ValueError as e:
+                    finish(k, _row(scenarios[k], error=str(e)))
+                    submit(chain, position + 1, None)
+                    continue
+                summary = {**result['summary'], 'generations': result['generations_run'],
+                           'stop_reason': result['stop_reason'] or f"{scenarios[k]['generations']} generations completed"}
+                if cache is not None and result['stop_reason'] is None:
+                    cache.put(config, data_version, summary, result['elites'], settings)
+                finish(k, _row(scenarios[k], summary))
+                submit(chain, position + 1, result['elites'])
+    return rows
+
+
+def _row(scenario, result=None, cached=False, error=None):
+    specific_players = scenario.get('specific_players') or {}
+    if isinstance(specific_players, dict):
+        specific_players = [f'{DAId}:{position}' for DAId, position in specific_players.items()]
+    row = {
+        'name': scenario.get('name', ''),
+        'formation': scenario.get('formation', '4-4-2'),
+        'budget': scenario.get('budget', 5000000),
+        'min_chemistry': scenario.get('min_chemistry', 27),
+        'greatest_squad': bool(scenario.get('greatest_squad', False)),
+        'legend_squad': bool(scenario.get('legend_squad', False)),
+        'specific_players': ' '.join(specific_players),
+        'cached': cached,
+        'error': error or '',
+    }
+    if result is not None:
+        row.update(fitness=round(result['fitness'], 2), cost=result['cost'], chemistry=result['chemistry'],
+                   generations=result.get('generations'), stop_reason=result.get('stop_reason'),
+                   squad='; '.join(f"{player['position']}: {player['name']}" for player in result['team']))
+    return {column: row.get(column, '') for column in COLUMNS}
+
+
+def write_table(rows, path):
+    # CSV for .csv paths, JSON otherwise
+    with open(path, 'w', newline='') as f:
+        if path.endswith('.csv'):
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, f, indent=2)
@@ -0,0 +1,236 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from player import PlayerTable
+from player_cache import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, PlayerPool, load_player_pool
+from solver import SquadSolver, formations
+from team import evaluate_population, population_matrix
+
+SOURCE_PATH = 'players_price_update.xlsx'
+SIZES = [1000, 10000, 100000]
+MODES = ['default', 'greatest_squad', 'legend_squad', 'specific_players']
+MIN_COST = 15000
+BUDGET = 5000000
+MIN_CHEMISTRY = 27
+
+
+def synthetic_pool(size, seed=0, source_path=SOURCE_PATH):
+    # Bootstrap rows of the real spreadsheet so positions, scores, prices and chemistry groups keep their joint
+    # distribution; every synthetic card gets its own name and DAId, and prices are jittered by up to 10%
+    real = load_player_pool(source_path)
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(real), size)
+
+    columns = {name: np.asarray(real.columns[name])[rows] for name in NUMERIC_COLUMNS}
+    columns['Cost'] = np.round(columns['Cost'] * rng.uniform(0.9, 1.1, size), -2)
+    columns['rank'] = np.arange(1, size + 1)
+    columns['DAId'] = np.arange(1, size + 1)
+    columns['ID'] = np.arange(1, size + 1)
+
+    codes = {name: np.asarray(real.codes[name])[rows] for name in CATEGORICAL_COLUMNS}
+    categories = dict(real.categories)
+    categories['Name'] = [f"{real.categories['Name'][code]} #{k}" for k, code in enumerate(codes['Name'].tolist())]
+    codes['Name'] = np.arange(size, dtype=np.int32)
+    return PlayerPool(f'synthetic-{size}-{seed}', columns, codes, categories)
+
+
+def solver_config(table, formation, mode):
+    config = dict(formation=formations[formation], budget=BUDGET, min_chemistry=MIN_CHEMISTRY)
+    if mode in ('greatest_squad', 'legend_squad'):
+        config[mode] = True
+    elif mode == 'specific_players':
+        # pin the best-scoring card of the first two positions in the formation
+        pins = {}
+        for position in list(formations[formation])[:2]:
+            scores = np.where(table.can_play[:, table.position_ids[position]], table.scores[:, table.position_ids[position]], -1)
+            scores[np.isin(table.DAId, list(pins))] = -1
+            pins[int(table.DAId[int(np.argmax(scores))])] = position
+        config['specific_players_info'] = pins
+    return config
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def timed(function, repeat, setup=None):
+    # (median, fastest) seconds per call; setup runs untimed before every call and its result is passed in
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        started = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), min(times)
+
+
+def micro_benchmarks(size, seed, repeat):
+    table = PlayerTable(synthetic_pool(size, seed), min_cost=MIN_COST)
+    solver = SquadSolver(table, **solver_config(table, '4-4-2', 'default'), seed=seed)
+    population = solver.population
+    matrices = population_matrix(population)
+
+    def fresh_chemistry(_):
+        for team in population:
+            team.chemistry = None
+            team.calculate_chemistry()
+
+    def parents():
+        return solver.select_parents(solver.evaluate()[1], solver.population_size)
+
+    def children(_=None):
+        return solver.crossover(parents())
+
+    def mutated_children():
+        population = children()
+        solver.mutate(population)
+        return population
+
+    def cold(setup=None):
+        # empty the fitness cache and the mutation memo first, so repetitions time the evaluation itself and not
+        # lookups of what the previous repetition already scored
+        def prepare():
+            solver.fitness_cache.clear()
+            solver.mutation_memo.clear()
+            return setup() if setup is not None else None
+        return prepare
+
+    benchmarks = {
+        'chemistry': (fresh_chemistry, None),
+        'chemistry_batch': (lambda _: evaluate_population(table, *matrices, BUDGET, MIN_CHEMISTRY), None),
+        'fitness': (lambda _: [team.fitness(BUDGET, MIN_CHEMISTRY) for team in population], None),
+        'fitness_batch': (lambda _: solver.fitness_values(population), cold()),
+        'selection': (lambda evaluated: solver.select_parents(evaluated[1], solver.population_size), solver.evaluate),
+        'crossover': (lambda selected: solver.crossover(selected), parents),
+        'mutation': (solver.mutate, cold(children)),
+        'budget_repair': (solver.repair_budget, mutated_children),
+        'generation': (lambda _: solver.step(), cold()),
+    }
+    results = []
+    for name, (function, setup) in benchmarks.items():
+        median, fastest = timed(function, repeat, setup)
+        results.append({'benchmark': name, 'size': size, 'teams': solver.population_size, 'repeat': repeat,
+                        'median_seconds': median, 'min_seconds': fastest})
+        print(f"micro {name:16} {size:>7} players: {median * 1000:9.3f} ms")
+    return results
+
+
+def _end_to_end(size, seed, formation, mode, generations, queue):
+    # runs in its own process so the peak RSS belongs to this case alone
+    started = time.perf_counter()
+    table = PlayerTable(synthetic_pool(size, seed), min_cost=MIN_COST)
+    setup_time = time.perf_counter() - started
+    try:
+        started = time.perf_counter()
+        solver = SquadSolver(table, **solver_config(table, formation, mode), seed=seed)
+        evolve_started = time.perf_counter()
+        best = solver.run(generations)
+        finished = time.perf_counter()
+    except ValueError as e:
+        queue.put({'status': 'error', 'error': str(e), 'setup_seconds': setup_time, 'peak_rss_mb': peak_rss_mb()})
+        return
+    queue.put({
+        'status': 'ok',
+        'setup_seconds': setup_time,
+        'wall_seconds': finished - started,
+        'generations': solver.generations_run,
+        'generations_per_second': solver.generations_run / (finished - evolve_started),
+        'peak_rss_mb': peak_rss_mb(),
+        'best_fitness': float(best.fitness(solver.mutation_budget(), solver.min_chemistry)),
+        'fitness_cache_hit_rate': solver.fitness_cache.hit_rate(),
+    })
+
+
+def end_to_end(size, seed, formation, mode, generations, timeout):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_end_to_end, args=(size, seed, formation, mode, generations, queue))
+    process.start()
+    try:
+        result = queue.get(timeout=timeout)
+    except Exception:
+        result = {'status': 'timeout', 'error': f'no result within {timeout}s'}
+    process.join(1)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    result = {'size': size, 'formation': formation, 'mode': mode, **result}
+    if result['status'] == 'ok':
+        print(f"e2e {formation:8} {mode:16} {size:>7} players: {result['wall_seconds']:7.2f}s, "
+              f"{result['generations_per_second']:7.1f} gen/s, {result['peak_rss_mb']:6.0f} MB, fitness {result['best_fitness']:.2f}")
+    else:
+        print(f"e2e {formation:8} {mode:16} {size:>7} players: {result['status']} ({result['error']})")
+    return result
+
+
+def compare(results, baseline):
+    # ratio of new to baseline time for every benchmark present in both files (below 1 is faster)
+    def keyed(data):
+        keys = {}
+        for row in data.get('micro', []):
+            keys['micro', row['benchmark'], row['size']] = row['median_seconds']
+        for row in data.get('end_to_end', []):
+            if row['status'] == 'ok':
+                keys['e2e', row['formation'], row['mode'], row['size']] = row['wall_seconds']
+        return keys
+
+    old, new = keyed(baseline), keyed(results)
+    ratios = {}
+    for key in sorted(set(old) & set(new), key=str):
+        if old[key]:
+            name = ' '.join(str(part) for part in key)
+            ratios[name] = new[key] / old[key]
+            print(f"{name:50} {ratios[name]:6.2f}x")
+    return ratios
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the GA hot paths and end-to-end solves on synthetic player pools.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='Synthetic pool sizes. Default is 1000 10000 100000.')
+    parser.add_argument('--formations', nargs='+', default=list(formations), help='Formations for the end-to-end runs. Default is all of them.')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES, help='Squad types for the end-to-end runs. Default is all of them.')
+    parser.add_argument('--generations', type=int, default=100, help='Generations per end-to-end run. Default is 100.')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions of each micro-benchmark. Default is 5.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic pools and the solver. Default is 0.')
+    parser.add_argument('--timeout', type=float, default=600, help='Seconds before an end-to-end run is abandoned. Default is 600.')
+    parser.add_argument('--skip_micro', action='store_true', help='Only run the end-to-end benchmarks.')
+    parser.add_argument('--skip_end_to_end', action='store_true', help='Only run the micro-benchmarks.')
+    parser.add_argument('--output', type=str, default='benchmark_results.json', help='Where to write the results. Default is benchmark_results.json.')
+    parser.add_argument('--baseline', type=str, help='Earlier results file to compare against.')
+    args = parser.parse_args()
+
+    results = {
+        'meta': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                 'seed': args.seed, 'generations': args.generations, 'repeat': args.repeat, 'started': time.time()},
+        'micro': [],
+        'end_to_end': [],
+    }
+    if not args.skip_micro:
+        for size in args.sizes:
+            results['micro'].extend(micro_benchmarks(size, args.seed, args.repeat))
+    if not args.skip_end_to_end:
+        for size in args.sizes:
+            for formation in args.formations:
+                for mode in args.modes:
+                    results['end_to_end'].append(end_to_end(size, args.seed, formation, mode, args.generations, args.timeout))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['baseline'] = {'path': args.baseline, 'ratios': compare(results, json.load(f))}
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import json
+import os
+
+import numpy as np
+
+from observers import Observer
+
+# bumped whenever the checkpoint layout changes
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path, solver, config, data_version, generation, generations, seed=None):
+    # Write the GA state as a compressed .npz: the population as (teams x slots) pool rows and position ids, the
+    # random generator's state, the generation counter and the best squad so far. Pool rows don't depend on
+    # min_cost filtering, so a checkpoint can resume on another machine with the same player data. The file is
+    # replaced atomically, so a node preempted mid-write leaves the previous checkpoint intact.
+    table = solver.table
+    players, positions = zip(*solver.export_teams(solver.population))
+    best = solver.best_team()
+    version, rng_state, gauss_next = solver.random.getstate()
+    meta = {
+        'version': CHECKPOINT_VERSION,
+        'data_version': data_version,
+        'generation': generation,
+        'generations': generations,
+        'seed': seed,
+        'config': {**config, 'specific_players_info': {str(DAId): position for DAId, position in config['specific_players_info'].items()}},
+        'positions': table.positions,
+        'best_fitness': float(solver.fitness_values([best], solver.min_chemistry + 2)[0]),
+        'random': [version, gauss_next],
+    }
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.savez_compressed(f, players=table.rows[np.array(players)].astype(np.int32), positions=np.array(positions, dtype=np.int16),
+                            best_players=table.rows[np.array(best.players)].astype(np.int32),
+                            best_positions=np.array(best.positions, dtype=np.int16),
+                            random=np.array(rng_state, dtype=np.uint32), meta=np.array(json.dumps(meta)))
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path, table, data_version):
+    # (SquadSolver config, solver state, meta) from a checkpoint written for the same player data
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        if meta['version'] != CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint {path} has format version {meta['version']}; this version reads {CHECKPOINT_VERSION}")
+        # price feeds don't invalidate a checkpoint, only a different spreadsheet does
+        if meta['data_version'].split('+')[0] != data_version.split('+')[0]:
+            raise ValueError(f"Checkpoint {path} was written for different player data; it can't be resumed on this pool")
+        rows = data['players']
+        position_ids = np.array([table.position_ids[name] for name in meta['positions']])
+        positions = position_ids[data['positions']]
+        rng_state = tuple(int(value) for value in data['random'])
+
+    # pool rows back to this table's indices
+    players = np.searchsorted(table.rows, rows)
+    if (players >= len(table.rows)).any() or (table.rows[np.minimum(players, len(table.rows) - 1)] != rows).any():
+        raise ValueError(f"Checkpoint {path} uses players filtered out of this table (was min_cost changed?)")
+
+    config = dict(meta['config'])
+    config['specific_players_info'] = {int(DAId): position for DAId, position in config['specific_players_info'].items()}
+    version, gauss_next = meta['random']
+    state = {'population': list(zip(players.tolist(), positions.tolist())), 'random': (version, rng_state, gauss_next)}
+    return config, state, meta
+
+
+class CheckpointObserver(Observer):
+    # saves a checkpoint every `every` generations; start is the generation the run resumed from
+    def __init__(self, path, every, config, data_version, generations, seed=None, start=0):
+        self.path = path
+        self.every = every
+        self.config = config
+        self.data_version = data_version
+        self.generations = generations
+        self.seed = seed
+        self.start = start
+
+    def generation_finished(self, solver, stats):
+        generation = self.start + stats['generation']
+        if generation % self.every == 0:
+            save_checkpoint(self.path, solver, self.config, self.data_version, generation, self.generations, self.seed)
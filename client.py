@@ -0,0 +1,45 @@
+import http.client
+import json
+import socket
+from urllib.parse import urlsplit
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def _connection(url, timeout=None):
+    # http://host:port or unix:///path/to/socket
+    parts = urlsplit(url)
+    if parts.scheme == 'unix':
+        return _UnixHTTPConnection(parts.path, timeout=timeout)
+    return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+
+
+def solve_remote(url, payload, on_progress=None, timeout=None):
+    # Send a squad request to service.py and return its result event, passing progress events to on_progress
+    connection = _connection(url, timeout)
+    try:
+        connection.request('POST', '/solve', json.dumps(payload), {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        if response.status != 200:
+            raise ValueError(json.loads(response.read()).get('error', f'service returned {response.status}'))
+        for line in response:
+            event = json.loads(line)
+            if event['event'] == 'progress':
+                if on_progress is not None:
+                    on_progress(event)
+            elif event['event'] == 'result':
+                return event
+            elif event['event'] == 'error':
+                raise RuntimeError(f"The solver service failed: {event['error']}")
+        raise ConnectionError('The solver service closed the stream without a result')
+    finally:
+        connection.close()
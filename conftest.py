@@ -0,0 +1,14 @@
+import pytest
+
+from player import PlayerTable
+from player_cache import load_player_pool
+
+
+@pytest.fixture(scope='session')
+def pool():
+    return load_player_pool('players_price_update.xlsx')
+
+
+@pytest.fixture(scope='session')
+def table(pool):
+    return PlayerTable(pool, min_cost=15000)
@@ -0,0 +1,133 @@
+import collections
+
+from team import Team
+
+# group counts that earn each chemistry point, as in team.player_chemistry
+CLUB_THRESHOLDS = (2, 4, 7)
+NATIONALITY_THRESHOLDS = (2, 5, 8)
+LEAGUE_THRESHOLDS = (3, 5, 8)
+
+
+def _load_solver(backend):
+    try:
+        from ortools.linear_solver import pywraplp
+    except ImportError:
+        raise ImportError("The exact solver needs OR-Tools: pip install ortools") from None
+    for name in (backend, 'SCIP', 'CBC'):
+        solver = pywraplp.Solver.CreateSolver(name)
+        if solver is not None:
+            return pywraplp, solver
+    raise RuntimeError(f"No MILP backend available (tried {backend}, SCIP, CBC)")
+
+
+def solve_exact(squad_solver, time_limit=60, warm_start=None, backend='SCIP'):
+    # Optimal squad for squad_solver's pool, formation, budget, pins and chemistry rules as a MILP.
+    # Returns (team, info) where info has status, objective, bound and the relative optimality gap.
+    pywraplp, model = _load_solver(backend)
+    table = squad_solver.table
+    budget = squad_solver.mutation_budget()
+
+    # pinned players fill their given positions first
+    pinned = [(player, table.position_ids[squad_solver.specific_players_info[DAId]]) for DAId, player in squad_solver.specific_players.items()]
+    pinned_names = {table.name_code[player] for player, _ in pinned}
+    open_slots = dict(squad_solver.formation_ids)
+    for _, position in pinned:
+        if position in open_slots:
+            open_slots[position] -= 1
+
+    # x[player, position] = 1 when player fills a slot at position
+    x = {}
+    for position, count in open_slots.items():
+        if count <= 0:
+            continue
+        for player in squad_solver.index.above[position]:
+            if table.name_code[player] not in pinned_names:
+                x[player, position] = model.BoolVar(f'x_{player}_{position}')
+
+    for position, count in open_slots.items():
+        model.Add(sum(var for (_, p), var in x.items() if p == position) == max(count, 0))
+
+    selected = collections.defaultdict(list)
+    for (player, _), var in x.items():
+        selected[player].append(var)
+    by_name = collections.defaultdict(list)
+    for player, variables in selected.items():
+        by_name[table.name_code[player]].extend(variables)
+    for variables in by_name.values():
+        model.Add(sum(variables) <= 1)  # the same card can't appear twice
+    sel = {player: sum(variables) for player, variables in selected.items()}
+
+    performance = sum(table.scores[player, position] * var for (player, position), var in x.items())
+    performance += sum(table.scores[player, position] for player, position in pinned)
+    cost = sum(table.cost[player] * expression for player, expression in sel.items())
+    cost += squad_solver.specific_players_cost
+
+    # group counts and their chemistry steps; icons and heroes count three times towards nation and league
+    def group_points(codes, weight, thresholds, name):
+        counts = collections.defaultdict(int)
+        for player, expression in sel.items():
+            counts[codes[player]] += weight(player) * expression
+        for player, _ in pinned:
+            counts[codes[player]] += weight(player)
+        points = {}
+        for group, count in counts.items():
+            steps = []
+            for threshold in thresholds:
+                step = model.BoolVar(f'{name}_{group}_{threshold}')
+                model.Add(count >= threshold * step)
+                if steps:
+                    model.Add(step <= steps[-1])  # a higher step implies the lower ones
+                steps.append(step)
+            points[group] = sum(steps)
+        return points
+
+    club_points = group_points(table.club, lambda player: 1, CLUB_THRESHOLDS, 'club')
+    nationality_points = group_points(table.nationality, lambda player: 3 if table.is_icon[player] else 1, NATIONALITY_THRESHOLDS, 'nation')
+    league_points = group_points(table.league, lambda player: 3 if table.is_hero[player] else 1, LEAGUE_THRESHOLDS, 'league')
+
+    def chemistry_var(player, selection):
+        chem = model.NumVar(0, 3, f'chem_{player}')
+        model.Add(chem <= 3 * selection)
+        model.Add(chem <= club_points[table.club[player]] + nationality_points[table.nationality[player]]
+                  + league_points[table.league[player]] + 3 * (1 - selection))
+        return chem
+
+    chemistry = sum(chemistry_var(player, expression) for player, expression in sel.items())
+    chemistry += sum(chemistry_var(player, 1) for player, _ in pinned)
+    model.Add(chemistry >= squad_solver.min_chemistry)
+
+    objective = performance * 30 + chemistry * 225
+    if budget is not None:
+        model.Add(cost <= budget)
+        deviation = model.NumVar(0, model.infinity(), 'budget_deviation')
+        model.Add(deviation >= budget - (cost - squad_solver.specific_players_cost))
+        model.Add(deviation >= (cost - squad_solver.specific_players_cost) - budget)
+        objective -= deviation / 10000
+    model.Maximize(objective)
+
+    if warm_start is not None:
+        hinted = set(zip(warm_start.players, warm_start.positions))
+        variables = list(x.values())
+        model.SetHint(variables, [1.0 if key in hinted else 0.0 for key in x])
+    if time_limit is not None:
+        model.SetTimeLimit(int(time_limit * 1000))
+
+    status = model.Solve()
+    statuses = {
+        pywraplp.Solver.OPTIMAL: 'optimal',
+        pywraplp.Solver.FEASIBLE: 'feasible',
+        pywraplp.Solver.INFEASIBLE: 'infeasible',
+        pywraplp.Solver.UNBOUNDED: 'unbounded',
+        pywraplp.Solver.ABNORMAL: 'abnormal',
+        pywraplp.Solver.NOT_SOLVED: 'not solved',
+    }
+    info = {'status': statuses.get(status, str(status)), 'objective': None, 'bound': None, 'gap': None}
+    if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+        return None, info
+
+    info['objective'] = model.Objective().Value()
+    info['bound'] = model.Objective().BestBound()
+    info['gap'] = 0.0 if status == pywraplp.Solver.OPTIMAL else abs(info['bound'] - info['objective']) / max(abs(info['objective']), 1e-9)
+
+    slots = list(pinned) + [key for key, var in x.items() if var.solution_value() > 0.5]
+    return Team(table, [player for player, _ in slots], [position for _, position in slots]), info
@@ -0,0 +1,71 @@
+import collections
+
+import numpy as np
+
+from team import evaluate_population, population_fitness, population_matrix
+
+
+class FitnessCache:
+    # Chemistry, performance and cost of recently evaluated teams, shared by every evaluation in a run.
+    # Entries are keyed on Team.signature(), so the same squad built twice (a copied parent, an elite, a repeated
+    # crossover) is only scored once. Fitness is derived per call from the budget and chemistry minimum, so one
+    # entry serves every fitness variant. The least recently used entries are dropped beyond capacity.
+    def __init__(self, table, capacity=4096):
+        self.table = table
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def evaluate(self, teams, budget, min_chemistry, specific_players_cost=0):
+        # the (chemistry, performance, cost, fitness) arrays evaluate_population returns for these teams
+        chemistry = np.zeros(len(teams), dtype=np.int64)
+        performance = np.zeros(len(teams))
+        cost = np.zeros(len(teams))
+        missing = []
+        for k, team in enumerate(teams):
+            entry = self.entries.get(team.signature())
+            if entry is None:
+                missing.append(k)
+            else:
+                self.entries.move_to_end(team.signature())
+                chemistry[k], performance[k], cost[k] = entry
+        self.hits += len(teams) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_chemistry, new_performance, new_cost, _ = evaluate_population(self.table, *population_matrix([teams[k] for k in missing]), None, 0)
+            chemistry[missing], performance[missing], cost[missing] = new_chemistry, new_performance, new_cost
+            for k, entry in zip(missing, zip(new_chemistry.tolist(), new_performance.tolist(), new_cost.tolist())):
+                self._store(teams[k].signature(), entry)
+        return chemistry, performance, cost, population_fitness(chemistry, performance, cost, budget, min_chemistry, specific_players_cost)
+
+    def lookup(self, team):
+        # (chemistry, performance, cost) of one team, computed from the team's own group counts on a miss
+        key = team.signature()
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = (team.calculate_chemistry(), team.performance_score(), team.cost())
+            self._store(key, entry)
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            team.chemistry = entry[0]
+        return entry
+
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        # forget every entry (after prices change), keeping the hit statistics
+        self.entries.clear()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate(), 'size': len(self.entries)}
@@ -0,0 +1,54 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from worker import evolve, init_worker
+
+
+def migrate(states, migrants):
+    # ring topology: island k receives the top teams of island k - 1 in place of its worst ones
+    emigrants = [state['population'][:migrants] for state in states]
+    for k, state in enumerate(states):
+        incoming = emigrants[k - 1]
+        population = state['population']
+        state['population'] = population[:max(len(population) - len(incoming), 0)] + incoming
+
+
+def run_islands(source_path, config, generations, islands=4, migrate_every=250, migrants=2,
+                seed=None, min_cost=15000, workers=None, callback=None, stopping=None, elites=None):
+    # Returns (best team as (players, positions), its fitness, why the run stopped, generations run, final state
+    # of the island holding the best team). Stored elites, if any, warm-start every island's first epoch.
+    seeds = [None if seed is None else seed + k for k in range(islands)]
+    states = [None] * islands
+    best, best_fitness, best_island = None, None, 0
+    stop_reason = f'{generations} generations completed'
+    if stopping is not None:
+        stopping.start()
+
+    with ProcessPoolExecutor(max_workers=workers or islands, initializer=init_worker, initargs=(source_path, min_cost)) as executor:
+        done = 0
+        while done < generations:
+            epoch = min(migrate_every, generations - done)
+            # islands stop mid-epoch on the target or the deadline; patience is judged on the global best between epochs
+            target_fitness = stopping.target_fitness if stopping is not None else None
+            time_limit = stopping.remaining_time() if stopping is not None else None
+            futures = [executor.submit(evolve, config, seeds[k], states[k], epoch, target_fitness, time_limit,
+                                       elites if states[k] is None else None) for k in range(islands)]
+            results = [future.result() for future in futures]
+            done += max(result['generations_run'] for result in results)
+
+            states = [result['state'] for result in results]
+            for k, result in enumerate(results):
+                if best_fitness is None or result['best_fitness'] > best_fitness:
+                    best, best_fitness, best_island = result['best'], result['best_fitness'], k
+            if callback is not None:
+                callback(done, best_fitness)
+
+            if stopping is not None:
+                reason = stopping.check(done, best_fitness)
+                if reason is not None:
+                    stop_reason = reason
+                    break
+
+            if done < generations and islands > 1:
+                migrate(states, migrants)
+
+    return best, best_fitness, stop_reason, done, states[best_island]
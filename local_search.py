@@ -0,0 +1,108 @@
+import time
+
+from team import Team, team_fitness
+
+# best-scoring and randomly sampled replacements tried per slot in every iteration
+TOP_CANDIDATES = 30
+SAMPLED_CANDIDATES = 20
+
+# iterations a card that left the team stays barred from coming back
+TABU_TENURE = 7
+
+
+def _candidate_lists(solver):
+    # per position, the cards the GA may use there (score above the squad type's minimum), best first
+    table = solver.table
+    lists = {}
+    for position in solver.formation_ids:
+        ranked = solver.index.by_score.get(position, [])
+        lists[position] = [player for player in ranked if table.scores[player, position] > solver.min_score]
+    return lists
+
+
+def _replacements(solver, candidates, max_cost, names):
+    # the best TOP_CANDIDATES affordable cards not already in the team, plus a random sample of the rest
+    table = solver.table
+    chosen = []
+    for player in candidates:
+        if (max_cost is None or table.cost[player] <= max_cost) and table.name_code[player] not in names:
+            chosen.append(player)
+            if len(chosen) == TOP_CANDIDATES:
+                break
+    sample = solver.random.sample(candidates, min(SAMPLED_CANDIDATES, len(candidates)))
+    chosen.extend(player for player in sample if (max_cost is None or table.cost[player] <= max_cost)
+                  and table.name_code[player] not in names and player not in chosen)
+    return chosen
+
+
+def polish(solver, team, time_limit, max_iterations=None):
+    # Tabu search from team over single-player swaps and position exchanges between two players who can play
+    # each other's positions. Every step takes the best admissible move, even a worsening one, so the search can
+    # leave local optima. Cards that just left stay out for TABU_TENURE iterations, unless bringing one back beats
+    # the best squad found. Pinned players stay in their positions, and every squad visited meets the chemistry
+    # minimum, the squad type's minimum score at every position and, unless building the greatest squad, the budget.
+    # Returns (best squad found as a new Team, iterations run).
+    table = solver.table
+    budget = solver.mutation_budget()
+    pinned = set(solver.specific_players.values())
+    candidate_lists = _candidate_lists(solver)
+    deadline = time.monotonic() + time_limit
+
+    def fitness_of(chemistry, performance, cost):
+        return team_fitness(chemistry, performance, cost, budget, solver.min_chemistry, solver.specific_players_cost)
+
+    current = Team(table, team.players, team.positions)
+    chemistry, performance, cost = current.calculate_chemistry(), current.performance_score(), current.cost()
+    best_fitness = fitness_of(chemistry, performance, cost)
+    best = (current.players, current.positions)
+    tabu = {}  # card name or exchanged pair -> last iteration it is tabu
+    iteration = 0
+    while time.monotonic() < deadline and (max_iterations is None or iteration < max_iterations):
+        iteration += 1
+        names = {table.name_code[player] for player in current.players}
+        move, move_fitness, move_values = None, None, None
+
+        slots = [(player, position) for player, position in zip(current.players, current.positions) if player not in pinned]
+        for old_player, position in slots:
+            max_cost = None if budget is None else budget - cost + table.cost[old_player]
+            for new_player in _replacements(solver, candidate_lists.get(position, []), max_cost, names):
+                chemistry_delta, performance_delta, cost_delta = current.swap_delta(old_player, new_player, position)
+                if chemistry + chemistry_delta < solver.min_chemistry:
+                    continue
+                values = (chemistry + chemistry_delta, performance + performance_delta, cost + cost_delta)
+                fitness = fitness_of(*values)
+                if tabu.get(table.name_code[new_player], 0) >= iteration and fitness <= best_fitness:
+                    continue
+                if move_fitness is None or fitness > move_fitness:
+                    move, move_fitness, move_values = ('swap', old_player, new_player, position), fitness, values
+
+        for k, (player1, position1) in enumerate(slots):
+            for player2, position2 in slots[k + 1:]:
+                if position1 == position2 or not (table.can_play[player1, position2] and table.can_play[player2, position1]):
+                    continue
+                # both players must stay above the squad type's minimum score in their new positions
+                if table.scores[player1, position2] <= solver.min_score or table.scores[player2, position1] <= solver.min_score:
+                    continue
+                performance_delta = (table.scores[player1, position2] + table.scores[player2, position1]
+                                     - table.scores[player1, position1] - table.scores[player2, position2])
+                values = (chemistry, performance + performance_delta, cost)
+                fitness = fitness_of(*values)
+                if tabu.get((player1, player2), 0) >= iteration and fitness <= best_fitness:
+                    continue
+                if move_fitness is None or fitness > move_fitness:
+                    move, move_fitness, move_values = ('exchange', player1, player2, None), fitness, values
+
+        if move is None:
+            break
+        kind, player1, player2, position = move
+        if kind == 'swap':
+            current.apply_swap(player1, player2, position)
+            tabu[table.name_code[player1]] = iteration + TABU_TENURE
+        else:
+            current.exchange_positions(player1, player2)
+            tabu[player1, player2] = iteration + TABU_TENURE
+        chemistry, performance, cost = move_values
+        if move_fitness > best_fitness:
+            best_fitness = move_fitness
+            best = (current.players, current.positions)
+    return Team(table, *best), iteration
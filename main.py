@@ -1,9 +1,64 @@
 import argparse
-import pandas as pd
-import random
-from player import Player
-from team import Team
-import collections
+import json
+import os
+from batch import grid_scenarios, load_scenarios, run_batch, write_table
+from client import solve_remote
+from player import PlayerTable
+from player_cache import load_player_pool
+from islands import run_islands
+from local_search import polish
+from checkpoint import CheckpointObserver, load_checkpoint
+from pareto import solve_pareto
+from observers import JsonLinesObserver, ProfileObserver
+from prices import PriceWatcher
+from result_cache import ELITE_COUNT, ResultCache, run_settings
+from solver import SELECTION_METHODS, SquadSolver, StoppingCriteria, formations, parse_specific_players
+
+def run_solver(args, solver, stopping, generations, start=0):
+    # Run the chosen solver for `generations` more generations (numbered from `start` when resuming);
+    # returns (best team, why it stopped, squads worth keeping for warm starts)
+    if args.solver == 'exact':
+        from exact import solve_exact
+
+        warm_start = solver.run(args.warm_start_generations) if args.warm_start_generations > 0 else None
+        best_team, info = solve_exact(solver, time_limit=args.exact_time_limit, warm_start=warm_start)
+        if best_team is None:
+            print(f"Exact solver finished without a squad ({info['status']})")
+            if warm_start is None:
+                return None, info['status'], []
+            best_team = warm_start
+            stop_reason = 'using the warm-start GA squad'
+        else:
+            stop_reason = f"exact solver {info['status']}, objective {round(info['objective'], 2)}, bound {round(info['bound'], 2)}, gap {info['gap']:.2%}"
+            if warm_start is not None and info['status'] != 'optimal':
+                # an unproven incumbent can be worse than the squad it was hinted with
+                ga_fitness, milp_fitness = solver.fitness_values([warm_start, best_team]).tolist()
+                if ga_fitness > milp_fitness:
+                    best_team = warm_start
+                    stop_reason += f'; kept the warm-start GA squad (fitness {round(ga_fitness, 2)} against {round(milp_fitness, 2)})'
+    else:
+        def report(generation):
+            if (start + generation) % 100 == 0: print(f"Generation {start + generation}")
+
+        # print every improvement as it is found; the final squad is printed in full below
+        for generation, team in solver.solve_iter(generations, report, stopping):
+            summary = solver.summary(team)
+            print(f"Generation {start + generation}: new best squad, fitness {round(summary['fitness'], 2)}, "
+                  f"cost {round(summary['cost'], 2)}, chemistry {summary['chemistry']}")
+        best_team = solver.best_team()
+        stop_reason = solver.stop_reason
+    elites = [best_team] + [team for team in solver.top_teams(ELITE_COUNT) if team is not best_team][:ELITE_COUNT - 1]
+    return best_team, stop_reason, elites
+
+
+def print_result(result):
+    # result as returned by SquadSolver.summary plus a stop reason
+    print(f"Finished: {result['stop_reason']}")
+    print("\nBest Team:")
+    for player in result['team']:
+        print(f"{player['position']}: {player['name']} (DA Score: {player['score']}, Cost: {player['cost']})")
+    print(f"Total rating: {round(result['fitness'], 2)}, Total cost: {round(result['cost'], 2)}, Chemistry: {result['chemistry']} out of 33")
+
 
 def main():
     # Parse command-line arguments
@@ -14,252 +69,228 @@ def main():
     parser.add_argument('--greatest_squad', action='store_true', help='If provided, disregards the budget and just creates the greatest squad with players having performance score higher than 98 and chemistry higher than 30.')
     parser.add_argument('--legend_squad', action='store_true', help='Generate a squad with only players with performance scores greater than 97 in their positions.')
     parser.add_argument('--specific_players', nargs='+', type=str, help='DAIds of specific players that must be included in the team. Should be passed as DAId:position pairs (e.g. 415:CM 237:ST).')
+    parser.add_argument('--generations', type=int, default=7500, help='Maximum number of generations to run. Default is 7500.')
+    parser.add_argument('--patience', type=int, help='Stop when the best fitness has not improved for this many generations.')
+    parser.add_argument('--min_diversity', type=float, help='Stop when the share of distinct squads in the population falls below this value (0-1).')
+    parser.add_argument('--target_fitness', type=float, help='Stop as soon as a squad reaches this fitness.')
+    parser.add_argument('--time_limit', type=float, help='Stop after this many seconds of evolution.')
+    parser.add_argument('--elites', type=int, default=2, help='Number of best squads carried unchanged into every generation. Default is 2.')
+    parser.add_argument('--selection', choices=SELECTION_METHODS, default='tournament', help='How parents are picked. Default is "tournament".')
+    parser.add_argument('--tournament_size', type=int, default=3, help='Squads competing in each tournament when --selection is tournament. Default is 3.')
+    parser.add_argument('--solver', choices=['ga', 'exact'], default='ga', help='"ga" runs the genetic algorithm; "exact" solves an integer program (needs OR-Tools), warm-started from a short GA run; it usually stops at the time limit with a gap of about 1%% rather than a proof of optimality.')
+    parser.add_argument('--exact_time_limit', type=float, default=60, help='Time limit in seconds for the exact solver. Default is 60.')
+    parser.add_argument('--warm_start_generations', type=int, default=200, help='GA generations used to warm-start the exact solver. Default is 200.')
+    parser.add_argument('--polish_time', type=float, default=0, help='Seconds of tabu search over single-player swaps and position exchanges to polish the final squad. Default is 0 (off).')
+    parser.add_argument('--prune_keep', type=int, help='Drop cards that this many cheaper, better cards of the same club, nation and league beat at a position without lowering the fitness. At the squad size (e.g. 11) this never loses the best squad; smaller values prune harder. Default is off.')
+    parser.add_argument('--pareto', action='store_true', help='Return the Pareto front of (cost, rating, chemistry) from one NSGA-II run instead of the single best squad for the budget, which caps the front.')
+    parser.add_argument('--pareto_output', type=str, help='With --pareto, write every front squad in full to this JSON file.')
+    parser.add_argument('--islands', type=int, default=1, help='Number of independent populations to evolve in parallel processes. Default is 1 (no islands).')
+    parser.add_argument('--migrate_every', '--migrate-every', type=int, default=250, help='Generations between exchanges of the best teams between islands.')
+    parser.add_argument('--migrants', type=int, default=2, help='Number of top teams each island sends to the next one when migrating.')
+    parser.add_argument('--stats_file', type=str, help='Append per-generation statistics (phase timings, fitness, chemistry, population sizes) to this JSON-lines file.')
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'], help='Profile the run with cProfile or pyinstrument.')
+    parser.add_argument('--profile_output', type=str, help='Write the profile here (.prof for cProfile, .html for pyinstrument) instead of printing it.')
+    parser.add_argument('--no_cache', action='store_true', help='Always solve from scratch instead of reusing or warm-starting from stored results.')
+    parser.add_argument('--batch', type=str, help='Solve every scenario in this YAML/JSON file (see batch.load_scenarios) and write one results table.')
+    parser.add_argument('--grid', action='store_true', help='Solve every formation at every budget in --grid_budgets and write one results table.')
+    parser.add_argument('--grid_budgets', type=int, nargs='+', help='Budgets for --grid. Default is 1M to 10M in steps of 1M.')
+    parser.add_argument('--output', type=str, default='batch_results.csv', help='Results table for --batch/--grid (.csv or .json). Default is batch_results.csv.')
+    parser.add_argument('--workers', type=int, help='Solver processes for --batch/--grid. Default is the number of CPUs.')
+    parser.add_argument('--seed', type=int, help='Seed for the random number generator, making runs reproducible.')
+    parser.add_argument('--checkpoint', type=str, help='Save the GA state to this file every --checkpoint_every generations.')
+    parser.add_argument('--follow_prices', type=int, default=0, help='Check for price feeds applied with prices.py every this many generations and reprice the running search. Default is 0 (off).')
+    parser.add_argument('--checkpoint_every', type=int, default=100, help='Generations between checkpoints. Default is 100.')
+    parser.add_argument('--resume', type=str, help='Continue the run saved in this checkpoint; its request and seed replace the command-line ones.')
+    parser.add_argument('--service', type=str, default=os.environ.get('SQUAD_SERVICE_URL'), help='Send the request to a running service.py (http://host:port or unix:///path) instead of solving locally. Defaults to $SQUAD_SERVICE_URL.')
 
 
     args = parser.parse_args()
 
-    # Map formations to player positions
-    formations = {
-        '4-4-2': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'LM': 1, 'CM': 2, 'RM': 1, 'ST': 2},
-        '4-2-4': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'LW': 1, 'CM': 2, 'RW': 1, 'ST': 2},
-        '4-3-3': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 3, 'LW': 1, 'RW': 1, 'ST': 1},
-        '3-5-2': {'GK': 1, 'CB': 3, 'LM': 1, 'RM': 1, 'CDM': 2, 'CAM': 1, 'ST': 2},
-        '4-2-3-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CDM': 2, 'CAM': 3 ,'ST': 1},
-        '4-5-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 1, 'CDM': 2, 'LM': 1, 'RM': 1, 'ST': 1},
-        '4-1-4-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CDM': 1, 'LM': 1, 'CM': 2, 'RM': 1, 'ST': 1},
-        '5-3-2': {'GK': 1, 'CB': 3, 'LB': 1, 'RB': 1, 'CM': 3, 'ST': 2},
-        '5-4-1': {'GK': 1, 'CB': 3, 'LB': 1, 'RB': 1, 'LM': 1, 'CM': 2, 'RM': 1, 'ST': 1},
-        '4-3-2-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 3, 'CF': 2, 'ST': 1},
-        '4-3-3_4': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 2, 'CAM': 1, 'LW': 1, 'RW': 1, 'ST': 1},
-    }
-
     if args.formation not in formations:
         print(f'Error: Invalid formation "{args.formation}". Available formations are: {", ".join(formations.keys())}')
         return
 
-    # Set constants
-    POPULATION_SIZE = 100
-    BUDGET = args.budget
-    FORMATION = formations[args.formation]
-    MIN_CHEMISTRY = args.min_chemistry
-    if MIN_CHEMISTRY < 0 or MIN_CHEMISTRY > 33:
+    if args.min_chemistry < 0 or args.min_chemistry > 33:
         raise ValueError("Minimum chemistry must be between 0 and 33 inclusive.")
-    
 
     # Process specific players argument
-    specific_players_info = {int(player.split(':')[0]): player.split(':')[1] for player in args.specific_players} if args.specific_players else {}
-
-
-    # Load data and initialize as before...
-    df = pd.read_excel('players_price_update.xlsx')
-    players = [Player(row) for index, row in df.iterrows() if row["Cost"] > 15000]
-
-    # Split specific players from the general pool of players
-    specific_players = {player.DAId: player for player in players if player.DAId in specific_players_info.keys()}
-    players = [player for player in players if player.DAId not in specific_players_info.keys()]
-
-    specific_players_cost = sum(player.cost for player in specific_players.values())
-
-
-    # Initialize greatest squad flag
-    greatest_squad = args.greatest_squad
-
-    #Initialize legend squad flag
-    legend_squad = args.legend_squad
-
+    specific_players_info = parse_specific_players(args.specific_players)
+
+    if args.batch or args.grid:
+        # shared settings from the command line; scenario files can override them per scenario
+        defaults = dict(min_chemistry=args.min_chemistry, greatest_squad=args.greatest_squad, legend_squad=args.legend_squad,
+                        specific_players=specific_players_info, elites=args.elites, selection=args.selection,
+                        tournament_size=args.tournament_size, target_fitness=args.target_fitness, time_limit=args.time_limit,
+                        seed=args.seed)
+        if args.batch:
+            scenarios = [{**defaults, **scenario} for scenario in load_scenarios(args.batch)]
+        else:
+            scenarios = grid_scenarios(budgets=args.grid_budgets, **defaults)
+
+        def report_scenario(done, total, row):
+            outcome = row['error'] or f"fitness {row['fitness']}, cost {row['cost']}, chemistry {row['chemistry']}" + (' (cached)' if row['cached'] else '')
+            print(f"[{done}/{total}] {row['formation']} at {row['budget']}: {outcome}")
+
+        rows = run_batch('players_price_update.xlsx', scenarios, args.generations, workers=args.workers,
+                         cache=None if args.no_cache else ResultCache(), callback=report_scenario)
+        write_table(rows, args.output)
+        print(f"Results for {len(rows)} scenarios written to {args.output}")
+        return
 
-    # If greatest squad is to be generated, filter players and set minimum chemistry to 30
-    if greatest_squad:
-        players = [player for player in players if any(score > 98 for score in player.performance_scores.values())]
-        MIN_CHEMISTRY = 29
-    else:
-        BUDGET = args.budget
-
-
-
-    # Collect all possible positions
-    all_positions = set()
-    for player in players:
-        all_positions.add(player.main_position)
-        all_positions.update(player.alt_positions)
-    
-    # Initialize data dictionary
-    data = {position: [] for position in all_positions}
-
-
-    # Add each player to each position they can play in
-    for player in players:
-        for position in [player.main_position] + list(player.alt_positions):
-            data[position].append(player)
-    
-    # Set the minimum score based on whether you are generating the greatest squad or not
-    if greatest_squad:
-        min_score = 98.75
-    elif legend_squad:
-        min_score = 97
-    else:
-        min_score = 89
-    
-
-    # Generate initial population
-    population = []
-    while len(population) < POPULATION_SIZE:
-        players_list = []
-        already_chosen_player_names = []
-
-        # First add specific players to the team and the list of already chosen players
-        for DAId, player in specific_players.items():
-            player.selected_position = specific_players_info[DAId]  # Set selected_position to the provided position
-            already_chosen_player_names.append(player.name)  # Immediately update chosen players
-            players_list.append(player)
-
-        for position, count in FORMATION.items():
-            if position in data:
-                available_players = [player for player in data[position] 
-                                    if player.performance_scores[position] > min_score 
-                                    and player.name not in already_chosen_player_names]
-                chosen_players = random.sample(available_players, k=count)
-                for player in chosen_players:
-                    player.selected_position = position  # Set selected_position
-                    already_chosen_player_names.append(player.name)  # Immediately update chosen players
-                players_list.extend(chosen_players)
+    if args.service:
+        if args.solver != 'ga' or args.islands > 1 or args.checkpoint or args.resume or args.pareto:
+            print('Error: the solver service only runs the default genetic algorithm (no --solver exact, --islands, checkpoints or --pareto).')
+            return
+        request = dict(budget=args.budget, formation=args.formation, min_chemistry=args.min_chemistry,
+                       greatest_squad=args.greatest_squad, legend_squad=args.legend_squad, specific_players=specific_players_info,
+                       generations=args.generations, patience=args.patience, min_diversity=args.min_diversity,
+                       target_fitness=args.target_fitness, time_limit=args.time_limit,
+                       elites=args.elites, selection=args.selection, tournament_size=args.tournament_size, seed=args.seed)
+
+        def report_remote(event):
+            if 'squad' in event:
+                print(f"Generation {event['generation']}: new best squad, fitness {round(event['squad']['fitness'], 2)}, "
+                      f"cost {round(event['squad']['cost'], 2)}, chemistry {event['squad']['chemistry']}")
             else:
-                print(f"No players can play the position {position}")
-                return
-        team = Team(players_list)
-        if team.calculate_chemistry() >= MIN_CHEMISTRY:
-            population.append(team)
-        
-    
-
-
-
-    # Run genetic algorithm
-    for generation in range(7500):  # Run for 20000 generations
-        if generation % 100 == 0: print(f"Generation {generation}")
-
-        # Calculate fitness values
-        fitness_values = [team.fitness(BUDGET, MIN_CHEMISTRY, specific_players_cost) if team.calculate_chemistry() >= MIN_CHEMISTRY else 1500 for team in population]
-
-
-        # Select parents
-        parents = []
-        while len(parents) < POPULATION_SIZE:
-            parent = random.choices(population, weights=fitness_values, k=1)[0]
-            if parent.calculate_chemistry() >= MIN_CHEMISTRY:
-                parents.append(parent)
-
-
-        # Perform crossover
-        population = []
-        for parent1, parent2 in zip(parents[::2], parents[1::2]):
-            new_team_players = []
-            already_chosen_positions = collections.defaultdict(int)  # Change to a dict to keep track of counts
-            # add specific players to the new team players
-            new_team_players.extend(specific_players.values())
-            for player in specific_players.values():
-                already_chosen_positions[player.selected_position] += 1
-            for position, count in FORMATION.items():
-                if already_chosen_positions[position] >= count:  # if enough players of position already filled, continue to next
-                    continue
-                parent_choice = random.choice([parent1, parent2])
-                parent_players = [player for player in parent_choice.players 
-                    if player.selected_position == position 
-                    and player.performance_scores[position] > min_score
-                    and player.DAId not in specific_players.keys()]  # Exclude specific players
-
-                # Modified part: choose min between available players and needed players
-                selected_players = random.sample(parent_players, min(count - already_chosen_positions[position], len(parent_players)))
-
-                for player in selected_players:
-                    already_chosen_positions[player.selected_position] += 1
-                new_team_players.extend(selected_players)
-
-                # If there are still spots left for the position, select additional players
-                if already_chosen_positions[position] < count:
-                    remaining_needed = count - already_chosen_positions[position]
-                    additional_players = [p for p in data[position] 
-                                        if p.DAId not in specific_players.keys()  # Exclude specific players
-                                        and p.performance_scores[position] > min_score
-                                        and already_chosen_positions[p.selected_position] < count]  # only select if less than required players have been chosen
-
-                    # Choose the smaller between remaining_needed and available players
-                    additional_players = random.sample(additional_players, min(remaining_needed, len(additional_players)))
-
-                    for player in additional_players:
-                        already_chosen_positions[player.selected_position] += 1
-                    new_team_players.extend(additional_players)
-            new_team = Team(new_team_players)
-            if new_team.calculate_chemistry() >= MIN_CHEMISTRY:
-                population.append(new_team)
-
-
-
-
-        # Perform mutation
-        for i, team in enumerate(population):
-            if random.random() < 0.1:  # 10% mutation rate
-                old_player = random.choice([player for player in team.players if player.DAId not in specific_players.keys()])  # Exclude specific players
-                if old_player.selected_position is None or old_player.selected_position not in data:
-                    continue
-
-                # Get a list of possible replacements
-                possible_replacements = [player for player in data[old_player.selected_position] if player != old_player and player.DAId not in specific_players.keys()]  # Exclude specific players
-
-                # If we're not generating the greatest squad, consider the budget
-                if not greatest_squad:
-                    possible_replacements = [player for player in possible_replacements if player.cost <= old_player.cost]
-
-                # Prioritize players who can enhance the overall team's score
-                possible_replacements.sort(key=lambda p: p.performance_scores[old_player.selected_position], reverse=True)
-
-                for new_player in possible_replacements:
-                    new_team_players = [new_player if player == old_player else player for player in team.players]
-                    new_team = Team(new_team_players)  # Generate a new team with the proposed player swap
-
-                    # If the new team is better than the old team, make the swap
-                    if new_team.fitness(None if greatest_squad else BUDGET, MIN_CHEMISTRY, specific_players_cost) > team.fitness(None if greatest_squad else BUDGET, MIN_CHEMISTRY, specific_players_cost) and new_team.calculate_chemistry() >= MIN_CHEMISTRY:
-                        population[i] = new_team
-                        break  # Once a suitable replacement has been found, break the loop
-
-
+                print(f"Generation {event['generation']}: best fitness {round(event['best_fitness'], 2)}")
+
+        try:
+            result = solve_remote(args.service, request, report_remote)
+        except ValueError as e:
+            print(e)
+            return
+        print_result(result)
+        return
 
-        # Replace over-budget teams
-        if not greatest_squad:  # If it's not greatest squad, then consider budget
-            for i, team in enumerate(population):
-                while team.cost() > BUDGET:
-                    # Filter players that are not in the specific_players list and get the most expensive one
-                    expensive_players = [player for player in team.players if player.DAId not in specific_players.keys()]
-                    if not expensive_players: 
-                        break
+    if args.pareto and (args.solver != 'ga' or args.islands > 1 or args.checkpoint or args.resume or args.polish_time > 0
+                        or args.target_fitness is not None):
+        print('Error: --pareto runs its own NSGA-II search (no --solver exact, --islands, checkpoints, --polish_time or --target_fitness).')
+        return
 
-                    old_player = max(expensive_players, key=lambda p: p.cost) 
-
-                    # Filter possible replacements: cheaper, positive cost, and compatible position
-                    possible_replacements = [player for player in players 
-                                            if player.cost < old_player.cost and player.cost > 0 
-                                            and (old_player.main_position == player.main_position or old_player.main_position in player.alt_positions)]
-                    if possible_replacements:
-                        new_player = random.choice(possible_replacements)
-                        team.players[team.players.index(old_player)] = new_player
-                    else:
-                        break
-
-        
-        # Remove teams with duplicate players
-        population = [team for team in population if len(set(player.name for player in team.players)) == len(team.players)]
+    # Load data from the columnar cache (rebuilt automatically when the spreadsheet changes)
+    source_path = 'players_price_update.xlsx'
+    pool = load_player_pool(source_path)
+    table = PlayerTable(pool, min_cost=15000)
+
+    config = dict(formation=formations[args.formation], budget=args.budget, min_chemistry=args.min_chemistry,
+                  specific_players_info=specific_players_info, greatest_squad=args.greatest_squad, legend_squad=args.legend_squad,
+                  elite_count=args.elites, selection=args.selection, tournament_size=args.tournament_size, prune_keep=args.prune_keep)
+    generations, start, seed, state = args.generations, 0, args.seed, None
+    if args.resume:
+        try:
+            config, state, meta = load_checkpoint(args.resume, table, pool.data_version)
+        except (OSError, ValueError) as e:
+            print(e)
+            return
+        generations, start, seed = meta['generations'] - meta['generation'], meta['generation'], meta['seed']
+        print(f"Resuming from generation {start} of {meta['generations']} (best fitness so far {round(meta['best_fitness'], 2)})")
+
+    # Reuse the answer to an identical earlier request solved the same way, or warm-start from a close one
+    cache = None if args.no_cache else ResultCache()
+    exact_settings = dict(exact_time_limit=args.exact_time_limit, warm_start_generations=args.warm_start_generations) if args.solver == 'exact' else {}
+    settings = run_settings(start + generations, seed, args.solver, args.islands, args.polish_time, **exact_settings)
+    cached = cache.get(config, pool.data_version, settings) if cache is not None and state is None and not args.pareto else None
+    if cached is not None:
+        print_result(dict(cached['result'], stop_reason='reused the stored result of an identical request'))
+        return
 
+    observers = []
+    if args.stats_file:
+        observers.append(JsonLinesObserver(args.stats_file))
+    if args.profile:
+        observers.append(ProfileObserver(args.profile, args.profile_output))
+    checkpoint_path = args.checkpoint or args.resume
+    if checkpoint_path:
+        if args.solver != 'ga' or args.islands > 1:
+            print('Error: checkpoints are only written by the default genetic algorithm (no --solver exact or --islands).')
+            return
+        observers.append(CheckpointObserver(checkpoint_path, args.checkpoint_every, config, pool.data_version, start + generations, seed, start))
+
+    watcher = None
+    if args.follow_prices > 0:
+        watcher = PriceWatcher(source_path, pool.data_version, args.follow_prices)
+        observers.append(watcher)
+
+    stopping = None
+    if any(value is not None for value in (args.patience, args.min_diversity, args.target_fitness, args.time_limit)):
+        stopping = StoppingCriteria(args.patience, args.min_diversity, args.target_fitness, args.time_limit)
+
+    islands = args.islands > 1 and args.solver == 'ga'
+    if islands:
+        # the islands evolve in worker processes; the local solver below takes over the final population of the
+        # island holding the best squad, to describe, polish and store it
+        if observers:
+            print('Error: --islands runs its populations in worker processes (no --stats_file, --profile or --follow_prices).')
+            return
+
+        def report_islands(generation, best_fitness):
+            print(f"Generation {generation}: best fitness {round(best_fitness, 2)}")
+
+        warm_start = cache.near(config, pool.data_version) if cache is not None else []
+        if warm_start:
+            print(f"Warm-starting the islands from {len(warm_start)} stored squads of a similar request")
+        try:
+            best, _, stop_reason, generations_run, state = run_islands(
+                source_path, config, generations, islands=args.islands, migrate_every=args.migrate_every, migrants=args.migrants,
+                seed=seed, callback=report_islands, stopping=stopping, elites=warm_start)
+        except ValueError as e:
+            print(e)
+            return
+
+    try:
+        solver = SquadSolver(table, **config, seed=seed, state=state, observers=observers)
+    except ValueError as e:
+        print(e)
+        return
+    index = solver.index
+    if config.get('prune_keep'):
+        print(f"Pruned {index.candidates_before - index.candidates_after} dominated candidates "
+              f"({index.candidates_before} -> {index.candidates_after} player-position entries)")
+    if cache is not None and state is None:
+        seeded = solver.seed_population(cache.near(config, pool.data_version))
+        if seeded:
+            print(f"Warm-starting from {seeded} stored squads of a similar request")
+
+    if args.pareto:
+        def report_pareto(generation):
+            if generation % 100 == 0: print(f"Generation {generation}")
+
+        front = solve_pareto(solver, generations, report_pareto, stopping)
+        print(f"Finished: {solver.stop_reason}")
+        print(f"\nPareto front: {len(front)} squads, cheapest first")
+        for team in front:
+            print(f"Cost: {round(team.cost(), 2)}, Rating: {round(team.performance_score(), 2)}, Chemistry: {team.calculate_chemistry()} out of 33")
+        if args.pareto_output:
+            with open(args.pareto_output, 'w') as f:
+                json.dump([{**solver.summary(team), 'performance': float(team.performance_score())} for team in front], f, indent=2)
+            print(f"Front squads written to {args.pareto_output}")
+        return
 
+    if islands:
+        best_team = solver.import_teams([best])[0]
+        elites = [best_team] + [team for team in solver.top_teams(ELITE_COUNT) if team.signature() != best_team.signature()][:ELITE_COUNT - 1]
+    else:
+        best_team, stop_reason, elites = run_solver(args, solver, stopping, generations, start)
+        if best_team is None:
+            return
+        generations_run = getattr(solver, 'generations_run', 0)
+    if args.polish_time > 0:
+        before = solver.summary(best_team)['fitness']
+        polished, iterations = polish(solver, best_team, args.polish_time)
+        after = solver.summary(polished)['fitness']
+        print(f"Polishing: fitness {round(before, 2)} -> {round(after, 2)} after {iterations} tabu-search iterations")
+        if after > before:
+            best_team = polished
+            elites = [polished] + elites
+    result = solver.summary(best_team)
+    result.update(generations=start + generations_run, stop_reason=stop_reason)
+    if cache is not None and (args.solver == 'exact' or stop_reason == f'{generations} generations completed'):
+        # stored under the prices the squad was last evaluated at; runs stopped early aren't stored
+        cache.put(config, pool.data_version if watcher is None else watcher.data_version, result, solver.export_elites(elites), settings)
 
     # Display best team
-    best_team = max(population, key=lambda team: team.fitness(None if greatest_squad else BUDGET, MIN_CHEMISTRY+2, specific_players_cost))
-    print("\nBest Team:")
-    for position in FORMATION:
-        players_in_position = [player for player in best_team.players if player.selected_position == position]
-        for player in players_in_position:
-            print(f"{position}: {player.name} (DA Score: {player.performance_scores[player.selected_position]}, Cost: {player.cost})")
-    print(f"Total rating: {round(best_team.fitness(None if greatest_squad else BUDGET, MIN_CHEMISTRY), 2)}, Total cost: {round(best_team.cost(), 2)}, Chemistry: {best_team.calculate_chemistry()} out of 33")
-    
+    print_result(result)
+
 
 
 
@@ -0,0 +1,84 @@
+import cProfile
+import json
+import pstats
+import sys
+import time
+
+
+class Observer:
+    # Instrumentation hooks called by SquadSolver.run; override the ones you need.
+    # phase stats hold 'seconds' and 'team_allocations', plus 'teams' after crossover and dedupe (the population
+    # size after each step), 'swaps' after mutation, 'iterations' after budget repair and 'replaced' after dedupe
+    # (invalid children swapped for a copy of their parent).
+    def run_started(self, solver):
+        pass
+
+    def phase_finished(self, solver, phase, stats):
+        pass
+
+    def generation_finished(self, solver, stats):
+        # stats: generation, population, best/mean/median fitness, chemistry histogram (index = chemistry), phases
+        # and the fitness cache's hits, misses, hit rate and size
+        pass
+
+    def run_finished(self, solver):
+        pass
+
+
+class JsonLinesObserver(Observer):
+    # one JSON object per generation, plus a final line with why the run stopped
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def run_started(self, solver):
+        self.file = open(self.path, 'a')
+        self.started = time.perf_counter()
+
+    def generation_finished(self, solver, stats):
+        self.file.write(json.dumps({**stats, 'elapsed': time.perf_counter() - self.started}) + '\n')
+
+    def run_finished(self, solver):
+        self.file.write(json.dumps({'finished': solver.stop_reason, 'generations': solver.generations_run,
+                                    'elapsed': time.perf_counter() - self.started}) + '\n')
+        self.file.close()
+
+
+class ProfileObserver(Observer):
+    # Profiles the whole run with cProfile or, if installed, pyinstrument.
+    # The report goes to output (a .prof file for cProfile, .html for pyinstrument) or is printed when output is None.
+    def __init__(self, backend='cprofile', output=None, limit=30):
+        if backend not in ('cprofile', 'pyinstrument'):
+            raise ValueError(f'Unknown profiler "{backend}"; use cprofile or pyinstrument')
+        if backend == 'pyinstrument':
+            try:
+                import pyinstrument
+            except ImportError:
+                raise ImportError("The pyinstrument profiler needs pyinstrument: pip install pyinstrument") from None
+            self.profiler = pyinstrument.Profiler()
+        else:
+            self.profiler = cProfile.Profile()
+        self.backend = backend
+        self.output = output
+        self.limit = limit
+
+    def run_started(self, solver):
+        if self.backend == 'pyinstrument':
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def run_finished(self, solver):
+        if self.backend == 'pyinstrument':
+            self.profiler.stop()
+            if self.output:
+                with open(self.output, 'w') as f:
+                    f.write(self.profiler.output_html())
+            else:
+                print(self.profiler.output_text())
+        else:
+            self.profiler.disable()
+            if self.output:
+                self.profiler.dump_stats(self.output)
+            else:
+                pstats.Stats(self.profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(self.limit)
@@ -0,0 +1,137 @@
+import numpy as np
+
+from team import Team
+
+# Genetic operators that keep squads valid by construction: every slot of the formation is filled, pinned players
+# keep their positions and no card appears twice. Each takes the SquadSolver whose pool, index and random stream it uses.
+
+# replacements whose chemistry effect greedy_repair checks before settling for the best-scoring one
+CHEMISTRY_CHECKS = 8
+
+
+def sample_distinct(solver, candidates, count, taken):
+    # up to count players from candidates whose names are not in taken (which is updated), in random order
+    rng = solver.random
+    name_code = solver.table.name_code
+    chosen = []
+    attempts = 0
+    while len(chosen) < count and attempts < 4 * count + 8 and candidates:
+        # random probing is cheap while few names are taken; fall back to filtering below
+        player = candidates[rng.randrange(len(candidates))]
+        attempts += 1
+        if name_code[player] not in taken:
+            taken.add(name_code[player])
+            chosen.append(player)
+    if len(chosen) < count:
+        rest = [player for player in candidates if name_code[player] not in taken]
+        for player in rng.sample(rest, min(count - len(chosen), len(rest))):
+            taken.add(name_code[player])
+            chosen.append(player)
+    return chosen
+
+
+def slot_assignment(solver, team):
+    # the team's unpinned players grouped by the position they fill
+    pinned = set(solver.specific_players.values())
+    slots = {}
+    for player, position in zip(team.players, team.positions):
+        if player not in pinned:
+            slots.setdefault(int(position), []).append(player)
+    return slots
+
+
+def _build(solver, chosen):
+    # Team from {position: players}, with pinned players in their given positions
+    players, positions = [], []
+    for player, position in solver.pinned:
+        players.append(player)
+        positions.append(position)
+    for position, slot_players in chosen.items():
+        players.extend(slot_players)
+        positions.extend([position] * len(slot_players))
+    return Team(solver.table, players, positions)
+
+
+def random_team(solver):
+    # a random squad of distinct cards for the open slots, or None when some position can't be filled
+    taken = {solver.table.name_code[player] for player, _ in solver.pinned}
+    chosen = {}
+    for position, count in solver.open_slots.items():
+        chosen[position] = sample_distinct(solver, solver.index.above[position], count, taken)
+        if len(chosen[position]) < count:
+            return None
+    return _build(solver, chosen)
+
+
+def uniform_crossover(solver, parent1, parent2):
+    # Slot-preserving uniform crossover: slot k of each position comes from either parent's slot k with equal
+    # odds, the other parent's when that card is already in the child, and a random eligible card otherwise
+    table = solver.table
+    rng = solver.random
+    slots1, slots2 = slot_assignment(solver, parent1), slot_assignment(solver, parent2)
+    taken = {table.name_code[player] for player, _ in solver.pinned}
+    chosen = {}
+    for position, count in solver.open_slots.items():
+        from1 = [player for player in slots1.get(position, ()) if table.scores[player, position] > solver.min_score]
+        from2 = [player for player in slots2.get(position, ()) if table.scores[player, position] > solver.min_score]
+        picked = []
+        for k in range(count):
+            options = [from1[k] if k < len(from1) else None, from2[k] if k < len(from2) else None]
+            if rng.random() < 0.5:
+                options.reverse()
+            for player in options:
+                if player is not None and table.name_code[player] not in taken:
+                    taken.add(table.name_code[player])
+                    picked.append(player)
+                    break
+        if len(picked) < count:
+            picked.extend(sample_distinct(solver, solver.index.above[position], count - len(picked), taken))
+        chosen[position] = picked
+    return _build(solver, chosen)
+
+
+def _cheaper_cards(solver, position, old_cost, max_cost, names, limit=20):
+    # up to limit best-scoring cards for position that cost less than old_cost and at most max_cost, skipping names in use
+    table = solver.table
+    cards = solver.index.cost_range(position, 0, old_cost)
+    cards = cards[table.cost[cards] <= max_cost]
+    if len(cards) > limit + len(names):
+        # only the best limit + len(names) scores can survive the name filter
+        keep = limit + len(names)
+        cards = cards[np.argpartition(-table.scores[cards, position], keep)[:keep]]
+    cards = cards[np.argsort(-table.scores[cards, position], kind='stable')]
+    return [player for player in cards.tolist() if table.name_code[player] not in names][:limit]
+
+
+def greedy_repair(solver, team, budget):
+    # Bring an over-budget team under budget in place. The unpinned player giving the least score per coin is traded
+    # for the best-scoring cheaper card that can fill the same slot, preferring one that keeps the chemistry minimum
+    # and, when possible, one that clears the whole overrun at once. Returns the number of trades made.
+    table = solver.table
+    pinned = set(solver.specific_players.values())
+    trades = 0
+    while team.cost() > budget:
+        overrun = team.cost() - budget
+        names = {table.name_code[player] for player in team.players}
+        chemistry = team.calculate_chemistry()
+        candidates = sorted(((player, int(position)) for player, position in zip(team.players, team.positions) if player not in pinned),
+                            key=lambda slot: table.scores[slot] / max(table.cost[slot[0]], 1))
+        for old_player, position in candidates:
+            old_cost = table.cost[old_player]
+            replacements = (_cheaper_cards(solver, position, old_cost, old_cost - overrun, names)
+                            or _cheaper_cards(solver, position, old_cost, old_cost, names))
+            if not replacements:
+                continue
+            new_player = replacements[0]
+            if chemistry >= solver.min_chemistry:
+                # a team already below the minimum is discarded anyway, so only valid teams pay for the check
+                for player in replacements[:CHEMISTRY_CHECKS]:
+                    if chemistry + team.swap_delta(old_player, player, position)[0] >= solver.min_chemistry:
+                        new_player = player
+                        break
+            team.apply_swap(old_player, new_player, position)
+            trades += 1
+            break
+        else:
+            return trades  # no cheaper card fits any slot
+    return trades
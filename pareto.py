@@ -0,0 +1,211 @@
+import numpy as np
+
+from operators import greedy_repair, random_team, sample_distinct, uniform_crossover
+from team import Team
+
+# NSGA-II over (total cost, performance score, chemistry): instead of one squad per budget, a single run returns the
+# squads no other squad beats on all three at once. It uses the SquadSolver's formation, pins, chemistry minimum and
+# operators; the solver's budget becomes the most a front squad may cost (no limit for the greatest squad).
+
+# share of children that get a random replacement card; higher than the GA's, since nothing here pulls towards one budget
+MUTATION_RATE = 0.3
+
+
+def non_dominated_ranks(values):
+    # front number of each row of an (n x objectives) array to minimise, 0 being the Pareto front
+    dominates = (values[:, None] <= values[None]).all(axis=2) & (values[:, None] < values[None]).any(axis=2)
+    counts = dominates.sum(axis=0)
+    ranks = np.full(len(values), -1)
+    current = np.flatnonzero(counts == 0)
+    front = 0
+    while len(current):
+        ranks[current] = front
+        counts = counts - dominates[current].sum(axis=0)
+        current = np.flatnonzero((counts == 0) & (ranks < 0))
+        front += 1
+    return ranks
+
+
+def crowding_distances(values, ranks):
+    # NSGA-II crowding distance within each front: the ends of every objective are infinitely far, the rest get
+    # the normalised gap between their neighbours summed over the objectives
+    distances = np.zeros(len(values))
+    for front in np.unique(ranks):
+        members = np.flatnonzero(ranks == front)
+        for column in values[members].T:
+            order = members[np.argsort(column, kind='stable')]
+            ordered = column[np.argsort(column, kind='stable')]
+            distances[order[0]] = distances[order[-1]] = np.inf
+            if len(members) > 2 and ordered[-1] > ordered[0]:
+                distances[order[1:-1]] += (ordered[2:] - ordered[:-2]) / (ordered[-1] - ordered[0])
+    return distances
+
+
+def _objectives(solver, teams):
+    # (teams x 3) array to minimise: cost, -performance, -chemistry
+    if not teams:
+        return np.empty((0, 3))
+    chemistry, performance, cost, _ = solver.fitness_cache.evaluate(teams, solver.mutation_budget(), solver.min_chemistry,
+                                                                    solver.specific_players_cost)
+    return np.column_stack([cost, -np.asarray(performance), -np.asarray(chemistry)]).astype(float)
+
+
+def _ranking(solver, teams):
+    # (rank, crowding distance, feasible) per team. Feasible teams (chemistry minimum met and, unless building the
+    # greatest squad, within budget) are sorted into fronts on (cost, -performance, -chemistry); infeasible ones all
+    # rank behind them, the least infeasible first
+    values = _objectives(solver, teams)
+    cost, chemistry = values[:, 0], -values[:, 2]
+    over_budget = np.zeros(len(teams)) if solver.greatest_squad else np.maximum(cost - solver.budget, 0) / max(solver.budget, 1)
+    violation = np.maximum(solver.min_chemistry - chemistry, 0) + over_budget
+    feasible = violation == 0
+
+    ranks = np.zeros(len(teams), dtype=np.int64)
+    crowding = np.zeros(len(teams))
+    if feasible.any():
+        values = values[feasible]
+        ranks[feasible] = non_dominated_ranks(values)
+        crowding[feasible] = crowding_distances(values, ranks[feasible])
+    ranks[~feasible] = ranks[feasible].max(initial=-1) + 1
+    crowding[~feasible] = -violation[~feasible]
+    return ranks, crowding, feasible
+
+
+def _cheapest_cost(solver):
+    # a lower bound on any squad's cost: the pins plus the cheapest eligible cards for every open slot
+    return solver.specific_players_cost + sum(sum(solver.index.sorted_costs[position][:count])
+                                              for position, count in solver.open_slots.items())
+
+
+def _spread_costs(solver, population):
+    # repair the starting squads to budgets spread between the cheapest possible squad and the most expensive one
+    # allowed, so the first fronts already span the price range
+    low = _cheapest_cost(solver)
+    high = max(team.cost() for team in population) if solver.greatest_squad else solver.budget
+    for team in population:
+        greedy_repair(solver, team, solver.random.uniform(low, max(low, high)))
+
+
+def _mutate(solver, team):
+    # swap a random unpinned player for a random eligible card of the same position, then repair the budget
+    table = solver.table
+    pinned = set(solver.specific_players.values())
+    slots = [(player, position) for player, position in zip(team.players, team.positions) if player not in pinned]
+    if not slots:
+        return
+    old_player, position = solver.random.choice(slots)
+    names = {table.name_code[player] for player in team.players}
+    replacement = sample_distinct(solver, solver.index.above.get(position, []), 1, names)
+    if replacement:
+        team.apply_swap(old_player, replacement[0], position)
+    if not solver.greatest_squad:
+        greedy_repair(solver, team, solver.budget)
+
+
+def _select(solver, population, ranks, crowding, count):
+    # binary tournaments: lower rank wins, then the less crowded team
+    parents = []
+    for _ in range(count):
+        first, second = solver.random.randrange(len(population)), solver.random.randrange(len(population))
+        if (ranks[second], -crowding[second]) < (ranks[first], -crowding[first]):
+            first = second
+        parents.append(population[first])
+    return parents
+
+
+def _distinct(teams):
+    # teams with distinct slot assignments, first occurrence kept
+    seen, distinct = set(), []
+    for team in teams:
+        if team.signature() not in seen:
+            seen.add(team.signature())
+            distinct.append(team)
+    return distinct
+
+
+def _report_generation(solver, generation, population, ranks, feasible, front, improvements):
+    # per-generation statistics for the observers: the front's size and its cost, performance and chemistry ranges
+    stats = {
+        'generation': generation,
+        'population': len(population),
+        'feasible': int(feasible.sum()),
+        'fronts': int(ranks.max(initial=-1)) + 1,
+        'front_size': len(front),
+        'front_improvements': improvements,
+        'fitness_cache': solver.fitness_cache.stats(),
+    }
+    if len(front):
+        stats.update(cost=[float(front[:, 0].min()), float(front[:, 0].max())],
+                     performance=[float(-front[:, 1].max()), float(-front[:, 1].min())],
+                     chemistry=[int(-front[:, 2].max()), int(-front[:, 2].min())])
+    for observer in solver.observers:
+        observer.generation_finished(solver, stats)
+
+
+def solve_pareto(solver, generations, callback=None, stopping=None):
+    # Evolve solver.population with NSGA-II: each generation breeds as many children as there are squads (binary
+    # tournament on rank and crowding, uniform crossover, random mutation, budget repair), then keeps the best
+    # fronts of parents and children together, cutting the last front that fits by crowding distance.
+    # Returns the feasible Pareto front, cheapest first. --patience counts generations in which no squad beat a
+    # squad of the previous front; a target fitness has no meaning here and is rejected.
+    if stopping is not None and stopping.target_fitness is not None:
+        raise ValueError("A Pareto run has no single fitness to reach; use patience, min_diversity or time_limit to stop it early.")
+    size = solver.population_size
+    population = [Team(solver.table, team.players, team.positions) for team in solver.population]
+    _spread_costs(solver, population)
+    solver.stop_reason = f'{generations} generations completed'
+    solver.generations_run = 0
+    if stopping is not None:
+        stopping.start()
+    for observer in solver.observers:
+        observer.run_started(solver)
+    try:
+        ranks, crowding, feasible = _ranking(solver, population)
+        previous, improvements = np.empty((0, 3)), 0
+        for generation in range(generations):
+            if callback is not None:
+                callback(generation)
+            parents = _select(solver, population, ranks, crowding, 2 * size)
+            children = [uniform_crossover(solver, parent1, parent2) for parent1, parent2 in zip(parents[::2], parents[1::2])]
+            for child in children:
+                if solver.random.random() < MUTATION_RATE:
+                    _mutate(solver, child)
+                elif not solver.greatest_squad:
+                    greedy_repair(solver, child, solver.budget)
+
+            combined = _distinct(population + children)
+            while len(combined) < size:
+                # converged below the population size: top up with fresh squads
+                team = random_team(solver)
+                if team is None:
+                    break
+                _spread_costs(solver, [team])
+                combined = _distinct(combined + [team])
+            ranks, crowding, feasible = _ranking(solver, combined)
+            keep = np.lexsort((-crowding, ranks))[:size]
+            population = [combined[k] for k in keep]
+            ranks, crowding, feasible = ranks[keep], crowding[keep], feasible[keep]
+            solver.generations_run = generation + 1
+
+            # the front moved forward when one of its squads beats a squad of the previous front (squads that only
+            # fill gaps between earlier ones don't count)
+            current = _objectives(solver, [population[k] for k in np.flatnonzero((ranks == 0) & feasible).tolist()])
+            if ((current[:, None] <= previous[None]).all(axis=2) & (current[:, None] < previous[None]).any(axis=2)).any():
+                improvements += 1
+            previous = current
+            if solver.observers:
+                _report_generation(solver, generation + 1, population, ranks, feasible, current, improvements)
+            if stopping is not None:
+                diversity = len(_distinct(population)) / len(population) if stopping.min_diversity is not None else None
+                reason = stopping.check(generation + 1, improvements, diversity)
+                if reason is not None:
+                    solver.stop_reason = reason
+                    break
+    finally:
+        for observer in solver.observers:
+            observer.run_finished(solver)
+
+    solver.population = population
+    front = [population[k] for k in np.flatnonzero((ranks == 0) & feasible).tolist()]
+    return sorted(front, key=lambda team: team.cost())
+
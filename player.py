@@ -1,41 +1,156 @@
-import pandas as pd
+import numpy as np
+
+# score column backing each position; several positions share one column
+SCORE_COLUMNS = {
+    'LB': 'percfb',
+    'RB': 'percfb',
+    'CB': 'perccb',
+    'LM': 'percwng',
+    'LW': 'percwng',
+    'RM': 'percwng',
+    'RW': 'percwng',
+    'CDM': 'perccdm',
+    'CM': 'perccm',
+    'CAM': 'perccam',
+    'LAM': 'perclam',
+    'RAM': 'percram',
+    'CF': 'perccf',
+    'ST': 'percst',
+    'GK': 'percgk',
+}
+
+# positions that appear in the data but have no score column of their own
+UNSCORED_POSITIONS = ['LWB', 'RWB']
+
+POSITIONS = list(SCORE_COLUMNS) + UNSCORED_POSITIONS
+
+
+class PlayerTable:
+    def __init__(self, pool, min_cost=None):
+        rows = np.arange(len(pool))
+        if min_cost is not None:
+            rows = rows[np.asarray(pool.columns['Cost'])[rows] > min_cost]
+        self.rows = rows
+
+        names = pool.categories['Name']
+        self.name_code = np.asarray(pool.codes['Name'])[rows]
+        self.name = np.array(names, dtype=object)[self.name_code]
+
+        position_codes = [np.asarray(pool.codes[column])[rows] for column in ('Position', 'AltPos1', 'AltPos2', 'AltPos3')]
+        self.positions = list(POSITIONS)
+        for name in pool.categories['Position'] + pool.categories['AltPos1'] + pool.categories['AltPos2'] + pool.categories['AltPos3']:
+            if name not in self.positions:
+                self.positions.append(name)
+        self.position_ids = {position: i for i, position in enumerate(self.positions)}
+
+        # remap each position column's codes onto table-wide position ids, keeping -1 for missing
+        position_maps = [
+            np.array([self.position_ids[name] for name in pool.categories[column]] + [-1], dtype=np.int16)
+            for column in ('Position', 'AltPos1', 'AltPos2', 'AltPos3')
+        ]
+        self.main_position = position_maps[0][position_codes[0]]
+        self.alt_positions = np.stack([mapping[codes] for mapping, codes in zip(position_maps[1:], position_codes[1:])], axis=1)
+
+        n = len(rows)
+        self.can_play = np.zeros((n, len(self.positions)), dtype=bool)
+        self.can_play[np.arange(n), self.main_position] = True
+        for column in self.alt_positions.T:
+            present = column >= 0
+            self.can_play[np.arange(n)[present], column[present]] = True
+
+        # one extra all-zero column so that position id -1 (no position) scores 0
+        self.scores = np.zeros((n, len(self.positions) + 1))
+        for position, column in SCORE_COLUMNS.items():
+            self.scores[:, self.position_ids[position]] = np.asarray(pool.columns[column])[rows]
+
+        self.cost = np.asarray(pool.columns['Cost'])[rows]
+        self.rank = np.asarray(pool.columns['rank'])[rows]
+        self.DAId = np.asarray(pool.columns['DAId'])[rows]
+        self.ID = np.asarray(pool.columns['ID'])[rows]
+
+        self.clubs = pool.categories['Club']
+        self.nationalities = pool.categories['Nationality']
+        self.leagues = pool.categories['League']
+        self.club = np.asarray(pool.codes['Club'])[rows]
+        self.nationality = np.asarray(pool.codes['Nationality'])[rows]
+        self.league = np.asarray(pool.codes['League'])[rows]
+        self.is_icon = np.array(['FUT ICONS' in club for club in self.clubs] + [False])[self.club]
+        self.is_hero = np.array(['HERO' in club for club in self.clubs] + [False])[self.club]
+        # plain-Python (club, nationality, league, is_icon, is_hero) per player for Team's per-player chemistry loops
+        self.chemistry_groups = list(zip(self.club.tolist(), self.nationality.tolist(), self.league.tolist(),
+                                         self.is_icon.tolist(), self.is_hero.tolist()))
+
+    def update_costs(self, pool):
+        # Take the prices of a later version of the same pool (see player_cache.apply_price_updates) in place.
+        # The rows picked by min_cost stay as they were. Returns the table indices whose cost changed.
+        cost = np.asarray(pool.columns['Cost'])[self.rows]
+        changed = np.flatnonzero(cost != self.cost)
+        self.cost[changed] = cost[changed]
+        return changed
+
+    def __len__(self):
+        return len(self.cost)
+
+    def __getitem__(self, index):
+        return Player(self, index)
+
+    def score(self, index, position):
+        return self.scores[index, self.position_ids.get(position, -1)]
+
 
 class Player:
-    def __init__(self, row):
-        if 'Name' not in row:
-            print('Invalid row', row)
-            return
-        self.name = row['Name']
-        self.main_position = row['Position']
-        self.alt_positions = [row['AltPos1'], row['AltPos2'], row['AltPos3']]  
-        self.alt_positions = [pos for pos in self.alt_positions if pd.notna(pos)]  
-        self.performance_scores = {
-            'LB': row['percfb'], 
-            'RB': row['percfb'],
-            'CB': row['perccb'], 
-            'LM': row['percwng'],
-            'LW': row['percwng'],
-            'RM': row['percwng'],
-            'RW': row['percwng'],
-            'CDM': row['perccdm'],
-            'CM': row['perccm'],
-            'CAM': row['perccam'],
-            'LAM': row['perclam'],
-            'RAM': row['percram'],
-            'CF': row['perccf'],
-            'ST': row['percst'],
-            'GK': row['percgk']
-        }
-        self.cost = row['Cost']
-        self.club = row['Club']
-        self.nationality = row['Nationality']
-        self.league = row['League']
-        self.rank = row['rank']
-        self.DAId = row['DAId']
-        self.ID = row['ID']
-        self.selected_position = None
-    
+    # read-only view of one row of a PlayerTable; the position a player fills belongs to the Team, not the player
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def name(self):
+        return self.table.name[self.index]
+
+    @property
+    def main_position(self):
+        return self.table.positions[self.table.main_position[self.index]]
+
+    @property
+    def alt_positions(self):
+        return [self.table.positions[position] for position in self.table.alt_positions[self.index] if position >= 0]
+
+    @property
+    def performance_scores(self):
+        return {position: self.table.scores[self.index, self.table.position_ids[position]] for position in SCORE_COLUMNS}
+
+    @property
+    def cost(self):
+        return self.table.cost[self.index]
+
+    @property
+    def club(self):
+        return self.table.clubs[self.table.club[self.index]]
+
+    @property
+    def nationality(self):
+        return self.table.nationalities[self.table.nationality[self.index]]
+
+    @property
+    def league(self):
+        return self.table.leagues[self.table.league[self.index]]
+
+    @property
+    def rank(self):
+        return self.table.rank[self.index]
+
+    @property
+    def DAId(self):
+        return self.table.DAId[self.index]
+
+    @property
+    def ID(self):
+        return self.table.ID[self.index]
+
     def __eq__(self, other):
         if isinstance(other, Player):
-            return self.name == other.name  
+            return self.name == other.name
         return False
@@ -0,0 +1,158 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = '.player_cache'
+CACHE_FORMAT = 1
+
+NUMERIC_COLUMNS = [
+    'rank', 'Rating', 'Cost', 'DAId', 'ID',
+    'percfb', 'perccb', 'percwng', 'perccdm', 'perccm', 'perccam',
+    'perclam', 'percram', 'perccf', 'percst', 'percgk',
+]
+
+# string columns are stored as int32 codes into a per-column list of categories, -1 meaning missing
+CATEGORICAL_COLUMNS = ['Name', 'Position', 'AltPos1', 'AltPos2', 'AltPos3', 'Club', 'Nationality', 'League']
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PlayerPool:
+    def __init__(self, source_hash, columns, codes, categories, price_hash=None):
+        self.source_hash = source_hash
+        self.columns = columns
+        self.codes = codes
+        self.categories = categories
+        # the spreadsheet plus any price feeds applied since; result caches and checkpoints key on this
+        self.data_version = source_hash if price_hash is None else f'{source_hash}+{price_hash}'
+
+    def __len__(self):
+        return len(self.columns['Cost'])
+
+
+def _cache_path(source_path, source_hash, cache_dir):
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, f'{stem}-{source_hash[:16]}')
+
+
+def build_cache(source_path, source_hash, target):
+    df = pd.read_excel(source_path)
+    meta = {'format': CACHE_FORMAT, 'source_hash': source_hash, 'rows': len(df), 'categories': {}}
+
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent)
+    try:
+        for name in NUMERIC_COLUMNS:
+            values = df[name].to_numpy()
+            dtype = np.float64 if name == 'Cost' or name.startswith('perc') else np.int64
+            np.save(os.path.join(tmp, f'{name}.npy'), values.astype(dtype))
+        for name in CATEGORICAL_COLUMNS:
+            codes, uniques = pd.factorize(df[name], use_na_sentinel=True)
+            np.save(os.path.join(tmp, f'{name}.codes.npy'), codes.astype(np.int32))
+            meta['categories'][name] = [str(value) for value in uniques]
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            # another process finished the same cache first
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def _remove_stale(source_path, keep, cache_dir):
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        if path != keep and entry.startswith(f'{stem}-') and len(entry) == len(stem) + 17:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load_player_pool(source_path, cache_dir=CACHE_DIR):
+    source_hash = file_hash(source_path)
+    target = _cache_path(source_path, source_hash, cache_dir)
+
+    meta_path = os.path.join(target, 'meta.json')
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    if meta is None or meta.get('format') != CACHE_FORMAT:
+        shutil.rmtree(target, ignore_errors=True)
+        build_cache(source_path, source_hash, target)
+        _remove_stale(source_path, target, cache_dir)
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+    columns = {name: np.load(os.path.join(target, f'{name}.npy'), mmap_mode='r') for name in NUMERIC_COLUMNS}
+    if meta.get('cost_file'):
+        columns['Cost'] = np.load(os.path.join(target, meta['cost_file']), mmap_mode='r')
+    codes = {name: np.load(os.path.join(target, f'{name}.codes.npy'), mmap_mode='r') for name in CATEGORICAL_COLUMNS}
+    return PlayerPool(source_hash, columns, codes, meta['categories'], meta.get('price_hash'))
+
+
+def data_stamp(source_path, source_hash, cache_dir=CACHE_DIR):
+    # Cheap change check for long-running readers: the spreadsheet's size and modification time and those of the
+    # cache metadata a price feed rewrites. When the stamp is unchanged, load_player_pool would return the same pool.
+    stamps = []
+    for path in (source_path, os.path.join(_cache_path(source_path, source_hash, cache_dir), 'meta.json')):
+        try:
+            stat = os.stat(path)
+            stamps.append((stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+def apply_price_updates(source_path, prices, cache_dir=CACHE_DIR):
+    # Apply {DAId: cost} to the cached pool without re-reading the spreadsheet; every row of a DAId gets its price.
+    # The new Cost column is written to its own file and meta.json is swapped atomically, so readers see either the
+    # old or the new prices, never a mix, and the data version changes only if some price did.
+    # Returns (updated pool, pool rows whose cost changed, DAIds not in the pool).
+    pool = load_player_pool(source_path, cache_dir)
+    target = _cache_path(source_path, pool.source_hash, cache_dir)
+    DAIds = np.asarray(pool.columns['DAId'])
+    unknown = sorted(set(prices) - set(DAIds.tolist()))
+
+    cost = np.array(pool.columns['Cost'])
+    rows = np.flatnonzero(np.isin(DAIds, list(prices)))
+    new_cost = np.array([prices[DAId] for DAId in DAIds[rows].tolist()], dtype=cost.dtype)
+    changed = rows[cost[rows] != new_cost]
+    if not len(changed):
+        return pool, changed, unknown
+    cost[changed] = new_cost[cost[rows] != new_cost]
+
+    price_hash = hashlib.sha256(cost.tobytes()).hexdigest()[:16]
+    cost_file = f'Cost-{price_hash}.npy'
+    np.save(os.path.join(target, f'{cost_file}.tmp.npy'), cost)
+    os.replace(os.path.join(target, f'{cost_file}.tmp.npy'), os.path.join(target, cost_file))
+
+    meta_path = os.path.join(target, 'meta.json')
+    with open(meta_path) as f:
+        meta = json.load(f)
+    previous = meta.get('cost_file')
+    meta.update(cost_file=cost_file, price_hash=price_hash)
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + '.tmp', meta_path)
+
+    # keep the previous prices for processes that read the old meta.json but haven't mapped its file yet
+    for path in glob.glob(os.path.join(target, 'Cost-*.npy')):
+        if os.path.basename(path) not in (cost_file, previous):
+            os.remove(path)
+    return load_player_pool(source_path, cache_dir), changed, unknown
@@ -0,0 +1,148 @@
+import bisect
+import heapq
+
+import numpy as np
+
+
+# coins of leftover budget worth one point of score: team_fitness weighs score by 30 and the gap between the
+# budget and the squad's cost by 1/10000, so a swap that saves more than this per point given up lowers fitness
+COST_PER_SCORE = 300000
+
+
+def dominated(table, players, position, keep, cost_per_score=COST_PER_SCORE):
+    # Mask of the players dominated at position by at least `keep` differently named cards of the same chemistry
+    # group (club, nation and league) that score higher there, cost no more, and don't save so much that the
+    # squad's fitness drops: (score gain) * cost_per_score >= (coins saved). Pass cost_per_score=None when cost
+    # doesn't enter the fitness (the greatest squad). When keep is at least the squad size, a squad holding a
+    # dominated card can always swap it for a dominator it doesn't contain yet, keeping its chemistry and budget
+    # and not lowering its fitness, so pruning never loses the best squad.
+    scores = table.scores[players, position].astype(float)
+    costs = table.cost[players].astype(float)
+    names = table.name_code[players]
+    groups = np.stack([table.club[players], table.nationality[players], table.league[players]])
+    order = np.lexsort(groups[::-1])
+    ordered = groups[:, order]
+    starts = np.flatnonzero(np.r_[True, (ordered[:, 1:] != ordered[:, :-1]).any(axis=0)]).tolist() + [len(order)]
+
+    mask = np.zeros(len(players), dtype=bool)
+    for start, end in zip(starts[:-1], starts[1:]):
+        if end - start <= keep:
+            continue  # too few cards in the group to dominate anything
+        members = order[start:end]
+        score, cost, name = scores[members], costs[members], names[members]
+        # beats[j, k]: card j dominates card k
+        beats = (score[:, None] > score[None]) & (cost[:, None] <= cost[None]) & (name[:, None] != name[None])
+        if cost_per_score is not None:
+            beats &= (score[:, None] - score[None]) * cost_per_score >= cost[None] - cost[:, None]
+        for k in np.flatnonzero(beats.sum(axis=0) >= keep).tolist():
+            mask[members[k]] = len(np.unique(name[beats[:, k]])) >= keep
+    return mask
+
+
+class PositionIndex:
+    # Per-position candidate views over a player pool, built once per run. With prune_keep, cards dominated by
+    # that many others of their chemistry group (see dominated) are left out; candidates_before and
+    # candidates_after count the (player, position) entries before and after pruning.
+    def __init__(self, table, players, min_score, prune_keep=None, cost_per_score=COST_PER_SCORE):
+        self.table = table
+        self.min_score = min_score
+        self.prune_keep = prune_keep
+        self.cost_per_score = cost_per_score
+        self.unpruned = {}  # position -> every player who can play it; dominance depends on prices, so kept for repricing
+        self.eligible = {}
+        self.above = {}
+        self.by_score = {}
+        self.by_cost = {}
+        self.sorted_costs = {}
+        self.rank_minima = {}
+        self.rank_slots = {}
+        self.candidates_before = 0
+        self.candidates_after = 0
+
+        players = np.asarray(players)
+        for position in range(len(table.positions)):
+            unpruned = players[table.can_play[players, position]]
+            self.candidates_before += len(unpruned)
+            if len(unpruned):
+                self.unpruned[position] = unpruned
+                self._build(position)
+
+    def _build(self, position):
+        # the candidate views of one position from its unpruned players and the table's current prices
+        table = self.table
+        eligible = self.unpruned[position]
+        if self.prune_keep:
+            eligible = eligible[~dominated(table, eligible, position, self.prune_keep, self.cost_per_score)]
+        self.candidates_after += len(eligible) - len(self.eligible.get(position, ()))
+        scores = table.scores[eligible, position]
+        by_score = np.argsort(-scores, kind='stable')
+        by_cost = np.argsort(table.cost[eligible], kind='stable')
+
+        self.eligible[position] = eligible
+        self.above[position] = eligible[scores > self.min_score].tolist()
+        self.by_score[position] = eligible[by_score].tolist()
+        self.by_cost[position] = eligible[by_cost]
+        self.sorted_costs[position] = table.cost[eligible[by_cost]].tolist()
+
+        # each card's place in the score order, listed in cost order, with range minima over it (a sparse table:
+        # level k holds the best place among 2**k consecutive cards) for best_by_score, and where each place sits
+        # in the cost order
+        rank = np.empty(len(eligible), dtype=np.int32)
+        rank[by_score] = np.arange(len(eligible))
+        levels = [rank[by_cost]]
+        while 2 ** len(levels) <= len(eligible):
+            width = 2 ** (len(levels) - 1)
+            levels.append(np.minimum(levels[-1][:-width], levels[-1][width:]))
+        self.rank_minima[position] = levels
+        self.rank_slots[position] = np.argsort(levels[0]).tolist()
+
+    def update_costs(self, players):
+        # after table.cost changed for players, rebuild the views of the positions they can play only, re-running
+        # the dominance check there since a repriced card may now (no longer) be dominated; returns the number
+        # of positions rebuilt
+        table = self.table
+        affected = np.flatnonzero(table.can_play[np.asarray(players, dtype=np.int64)].any(axis=0)).tolist()
+        affected = [position for position in affected if position in self.unpruned]
+        for position in affected:
+            self._build(position)
+        return len(affected)
+
+    def __contains__(self, position):
+        return position in self.eligible
+
+    def positions(self):
+        return list(self.eligible)
+
+    def best_by_score(self, position, max_cost=None):
+        # players who can play position, best score first, optionally costing at most max_cost. The affordable
+        # cards are a prefix of the cost order; the best of any stretch of it is two sparse-table lookups, so
+        # every card yielded takes O(log n) however many pricier cards outscore it
+        if position not in self.by_score:
+            return
+        by_score = self.by_score[position]
+        if max_cost is None:
+            yield from by_score
+            return
+        levels, slots = self.rank_minima[position], self.rank_slots[position]
+        stretches = []  # heap of (best place in the score order, start, end) over stretches of the cost order
+
+        def push(start, end):
+            if start < end:
+                k = (end - start).bit_length() - 1
+                heapq.heappush(stretches, (int(min(levels[k][start], levels[k][end - 2 ** k])), start, end))
+
+        push(0, bisect.bisect_right(self.sorted_costs[position], max_cost))
+        while stretches:
+            rank, start, end = heapq.heappop(stretches)
+            yield by_score[rank]
+            push(start, slots[rank])
+            push(slots[rank] + 1, end)
+
+    def cost_range(self, position, min_cost=None, max_cost=None):
+        # players who can play position with min_cost < cost < max_cost, cheapest first
+        costs = self.sorted_costs.get(position)
+        if costs is None:
+            return np.empty(0, dtype=np.int64)
+        lo = 0 if min_cost is None else bisect.bisect_right(costs, min_cost)
+        hi = len(costs) if max_cost is None else bisect.bisect_left(costs, max_cost)
+        return self.by_cost[position][lo:hi]
@@ -0,0 +1,53 @@
+import argparse
+import csv
+import json
+
+from observers import Observer
+from player_cache import apply_price_updates, load_player_pool
+
+SOURCE_PATH = 'players_price_update.xlsx'
+
+
+def read_price_feed(path):
+    # {DAId: cost} from a CSV with DAId and Cost columns, or JSON holding {DAId: cost} or [{"DAId": ..., "Cost": ...}]
+    with open(path, newline='') as f:
+        if path.endswith('.json'):
+            data = json.load(f)
+            if isinstance(data, dict):
+                return {int(DAId): float(cost) for DAId, cost in data.items()}
+            return {int(row['DAId']): float(row['Cost']) for row in data}
+        return {int(row['DAId']): float(row['Cost']) for row in csv.DictReader(f)}
+
+
+class PriceWatcher(Observer):
+    # Picks up price feeds applied while a run is going: every `every` generations it checks the pool's data
+    # version and reprices the running solver in place when it changed
+    def __init__(self, source_path, data_version, every=100):
+        self.source_path = source_path
+        self.data_version = data_version
+        self.every = every
+
+    def generation_finished(self, solver, stats):
+        if stats['generation'] % self.every:
+            return
+        pool = load_player_pool(self.source_path)
+        if pool.data_version != self.data_version:
+            changed = solver.update_prices(pool)
+            self.data_version = pool.data_version
+            print(f"Generation {stats['generation']}: new prices for {len(changed)} players")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply a price feed (DAId -> Cost) to the cached player pool without re-reading the spreadsheet.')
+    parser.add_argument('feed', help='CSV with DAId and Cost columns, or JSON ({"DAId": cost, ...} or a list of {"DAId", "Cost"} objects).')
+    parser.add_argument('--source', type=str, default=SOURCE_PATH, help=f'Spreadsheet whose cached pool gets the prices. Default is {SOURCE_PATH}.')
+    args = parser.parse_args()
+
+    pool, changed, unknown = apply_price_updates(args.source, read_price_feed(args.feed))
+    print(f"Updated the price of {len(changed)} rows; data version is now {pool.data_version}")
+    if unknown:
+        print(f"{len(unknown)} DAIds are not in the pool: {', '.join(map(str, unknown[:20]))}{' ...' if len(unknown) > 20 else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+CACHE_PATH = os.path.join('.player_cache', 'results.sqlite')
+
+# a stored run can warm-start a request whose budget is within this fraction of its own
+NEAR_BUDGET = 0.05
+
+# number of best squads stored per run for warm starts
+ELITE_COUNT = 10
+
+
+def run_settings(generations, seed=None, solver='ga', islands=1, polish_time=0, **extra):
+    # how a request was solved: runs differing in any of these can return different squads, so they don't share
+    # cache entries. extra takes solver-specific settings such as the exact solver's time limit
+    return {'generations': int(generations), 'seed': seed, 'solver': solver, 'islands': int(islands),
+            'polish_time': float(polish_time), **extra}
+
+
+def normalize_request(config, settings=None):
+    # the parts of a SquadSolver config and of the run settings (see run_settings) that decide its answer, in a
+    # canonical JSON-ready form
+    return {
+        'formation': sorted(config['formation'].items()),
+        'budget': int(config['budget']),
+        'min_chemistry': int(config['min_chemistry']),
+        'greatest_squad': bool(config.get('greatest_squad', False)),
+        'legend_squad': bool(config.get('legend_squad', False)),
+        'specific_players': sorted((int(DAId), position) for DAId, position in (config.get('specific_players_info') or {}).items()),
+        'search': {'elite_count': int(config.get('elite_count', 2)), 'selection': config.get('selection', 'tournament'),
+                   'tournament_size': int(config.get('tournament_size', 3)), 'prune_keep': config.get('prune_keep'),
+                   **(settings or {})},
+    }
+
+
+def request_key(config, data_version, settings=None):
+    request = normalize_request(config, settings)
+    return hashlib.sha256(json.dumps([request, data_version], sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    # Finished solves keyed on the normalized request, its run settings and the player-data version. Only runs that
+    # went their full length belong here: one cut short by a time limit, patience or cancellation isn't the answer
+    # to the request.
+    # Recent entries are kept in memory (LRU); every entry is also stored in SQLite so it survives restarts.
+    def __init__(self, path=CACHE_PATH, capacity=128):
+        self.capacity = capacity
+        self.memory = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY, data_version TEXT, formation TEXT, budget INTEGER, min_chemistry INTEGER,
+            greatest_squad INTEGER, legend_squad INTEGER, specific_players TEXT, result TEXT, elites TEXT, created REAL)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS results_near ON results (data_version, formation, greatest_squad, legend_squad, specific_players, budget)')
+        self.db.commit()
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def get(self, config, data_version, settings=None):
+        # {'result': ..., 'elites': ...} for an identical earlier request solved the same way, or None
+        key = request_key(config, data_version, settings)
+        entry = self.memory.get(key)
+        if entry is None:
+            row = self.db.execute('SELECT result, elites FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                entry = {'result': json.loads(row[0]), 'elites': json.loads(row[1])}
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, entry)
+        return entry
+
+    def put(self, config, data_version, result, elites, settings=None):
+        key = request_key(config, data_version, settings)
+        request = normalize_request(config)
+        entry = {'result': result, 'elites': elites}
+        self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+            key, data_version, json.dumps(request['formation']), request['budget'], request['min_chemistry'],
+            int(request['greatest_squad']), int(request['legend_squad']), json.dumps(request['specific_players']),
+            json.dumps(result), json.dumps(elites), time.time()))
+        self.db.commit()
+        self._remember(key, entry)
+
+    def near(self, config, data_version, budget_tolerance=NEAR_BUDGET):
+        # elite teams of the closest stored run with the same formation, squad type and pins, and a budget within
+        # budget_tolerance (any minimum chemistry); [] when there is none. Runs on earlier prices of the same
+        # spreadsheet (data versions '<source hash>+<price hash>') qualify too, after those on the current prices,
+        # since SquadSolver.import_elites re-checks the budget with today's prices.
+        request = normalize_request(config)
+        budget = request['budget']
+        source_hash = data_version.split('+')[0]
+        row = self.db.execute('''SELECT elites FROM results
+            WHERE (data_version = ? OR data_version LIKE ?) AND formation = ? AND greatest_squad = ? AND legend_squad = ?
+              AND specific_players = ? AND budget BETWEEN ? AND ?
+            ORDER BY data_version != ?, ABS(budget - ?), ABS(min_chemistry - ?) LIMIT 1''', (
+            source_hash, source_hash + '+%', json.dumps(request['formation']), int(request['greatest_squad']),
+            int(request['legend_squad']), json.dumps(request['specific_players']), budget * (1 - budget_tolerance),
+            budget * (1 + budget_tolerance), data_version, budget, request['min_chemistry'])).fetchone()
+        return json.loads(row[0]) if row is not None else []
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from player_cache import data_stamp, load_player_pool
+from result_cache import ResultCache, run_settings
+from solver import StoppingCriteria, parse_request
+from worker import evolve, init_worker
+
+SOURCE_PATH = 'players_price_update.xlsx'
+
+
+class SolverService:
+    # Loads the player pool once and solves squad requests concurrently on a process pool.
+    # Each request runs as a chain of short epochs, so requests interleave fairly and progress can be streamed.
+    def __init__(self, source_path=SOURCE_PATH, workers=None, epoch=100, min_cost=15000, cache=None):
+        pool = load_player_pool(source_path)  # builds the cache once, before the workers memory-map it
+        self.source_path = source_path
+        self.source_hash = pool.source_hash
+        self.data_version = pool.data_version
+        self.stamp = data_stamp(source_path, pool.source_hash)
+        self.players = len(pool)
+        self.epoch = epoch
+        self.cache = cache
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(source_path, min_cost))
+
+    async def solve(self, payload):
+        # async generator of progress events followed by the result event
+        config, options = parse_request(payload)
+        generations = options['generations']
+        stopping = StoppingCriteria(options['patience'], options['min_diversity'], options['target_fitness'], options['time_limit'])
+        loop = asyncio.get_running_loop()
+        data_version = await self._current_data_version(loop)  # prices may have changed since the last request
+
+        # identical requests are answered from the cache; close ones start from its stored elites
+        elites = None
+        settings = run_settings(generations, options['seed'])
+        if self.cache is not None:
+            cached = self.cache.get(config, data_version, settings)
+            if cached is not None:
+                yield {'event': 'result', **cached['result'], 'cached': True, 'data_version': data_version}
+                return
+            elites = self.cache.near(config, data_version)
+
+        state, best, done, reason = None, None, 0, None
+        while done < generations and reason is None:
+            epoch = min(self.epoch, generations - done)
+            result = await loop.run_in_executor(self.executor, evolve, config, options['seed'], state, epoch,
+                                                stopping.target_fitness, stopping.remaining_time(), elites, data_version)
+            state = result['state']
+            done += result['generations_run']
+            event = {'event': 'progress', 'generation': done, 'generations': generations}
+            if best is None or result['best_fitness'] > best['best_fitness']:
+                best = result
+                event['squad'] = best['summary']  # only sent when the best squad improved
+            yield {**event, 'best_fitness': best['best_fitness']}
+            reason = result['stop_reason'] or stopping.check(done, result['best_fitness'], result['diversity'])
+
+        result = {**best['summary'], 'generations': done, 'stop_reason': reason or f'{generations} generations completed'}
+        if self.cache is not None and done >= generations:
+            self.cache.put(config, data_version, result, best['elites'], settings)
+        yield {'event': 'result', **result, 'data_version': data_version}
+
+    async def _current_data_version(self, loop):
+        # Reload the pool only when the spreadsheet or its cache metadata changed, and then in a thread: hashing
+        # the spreadsheet, let alone rebuilding its cache, would stall every connected client
+        stamp = data_stamp(self.source_path, self.source_hash)
+        if stamp != self.stamp:
+            pool = await loop.run_in_executor(None, load_player_pool, self.source_path)
+            self.source_hash, self.data_version = pool.source_hash, pool.data_version
+            self.stamp = data_stamp(self.source_path, pool.source_hash)
+        return self.data_version
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            if method == 'GET' and path == '/health':
+                await self._send_json(writer, 200, {'status': 'ok', 'players': self.players, 'data_version': self.data_version})
+            elif method == 'POST' and path == '/solve':
+                await self._stream_solve(writer, body)
+            else:
+                await self._send_json(writer, 404, {'error': f'{method} {path} not found'})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream_solve(self, writer, body):
+        # the first epoch validates the request, so errors can still get a plain 400
+        try:
+            events = self.solve(json.loads(body or b'{}'))
+        except ValueError as e:
+            await self._send_json(writer, 400, {'error': str(e)})
+            return
+        try:
+            try:
+                first = await events.__anext__()
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                await self._send_json(writer, 400, {'error': str(e)})
+                return
+
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n')
+            await self._send_chunk(writer, first)
+            try:
+                async for event in events:
+                    await self._send_chunk(writer, event)
+            except ConnectionError:
+                raise
+            except Exception as e:
+                # the status line is already out, so report the failure in the stream itself
+                await self._send_chunk(writer, {'event': 'error', 'error': str(e)})
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        finally:
+            await events.aclose()  # stop scheduling epochs if the client went away
+
+    @staticmethod
+    async def _send_chunk(writer, event):
+        data = json.dumps(event).encode() + b'\n'
+        writer.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        await writer.drain()
+
+    @staticmethod
+    async def _send_json(writer, status, payload):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}
+        data = json.dumps(payload).encode()
+        writer.write(f'HTTP/1.1 {status} {reasons[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode() + data)
+        await writer.drain()
+
+
+async def serve(service, host='127.0.0.1', port=8765, unix_socket=None):
+    if unix_socket:
+        server = await asyncio.start_unix_server(service.handle, path=unix_socket)
+        print(f'Squad solver listening on unix://{unix_socket}')
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        print(f'Squad solver listening on http://{host}:{port}')
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve squad requests from a warm, shared player pool.')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to listen on. Default is 127.0.0.1.')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on. Default is 8765.')
+    parser.add_argument('--unix_socket', type=str, help='Listen on this Unix socket path instead of TCP.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of solver processes. Default is the number of CPUs.')
+    parser.add_argument('--no_cache', action='store_true', help='Solve every request from scratch instead of reusing stored results.')
+    parser.add_argument('--epoch', type=int, default=100, help='Generations per scheduling slice and progress update. Default is 100.')
+    args = parser.parse_args()
+
+    service = SolverService(workers=args.workers, epoch=args.epoch, cache=None if args.no_cache else ResultCache())
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.executor.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,521 @@
+import collections
+import random
+import time
+
+import numpy as np
+
+from fitness_cache import FitnessCache
+from operators import greedy_repair, random_team, uniform_crossover
+from position_index import COST_PER_SCORE, PositionIndex
+from team import Team, team_fitness
+
+# Map formations to player positions
+formations = {
+    '4-4-2': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'LM': 1, 'CM': 2, 'RM': 1, 'ST': 2},
+    '4-2-4': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'LW': 1, 'CM': 2, 'RW': 1, 'ST': 2},
+    '4-3-3': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 3, 'LW': 1, 'RW': 1, 'ST': 1},
+    '3-5-2': {'GK': 1, 'CB': 3, 'LM': 1, 'RM': 1, 'CDM': 2, 'CAM': 1, 'ST': 2},
+    '4-2-3-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CDM': 2, 'CAM': 3 ,'ST': 1},
+    '4-5-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 1, 'CDM': 2, 'LM': 1, 'RM': 1, 'ST': 1},
+    '4-1-4-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CDM': 1, 'LM': 1, 'CM': 2, 'RM': 1, 'ST': 1},
+    '5-3-2': {'GK': 1, 'CB': 3, 'LB': 1, 'RB': 1, 'CM': 3, 'ST': 2},
+    '5-4-1': {'GK': 1, 'CB': 3, 'LB': 1, 'RB': 1, 'LM': 1, 'CM': 2, 'RM': 1, 'ST': 1},
+    '4-3-2-1': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 3, 'CF': 2, 'ST': 1},
+    '4-3-3_4': {'GK': 1, 'CB': 2, 'LB': 1, 'RB': 1, 'CM': 2, 'CAM': 1, 'LW': 1, 'RW': 1, 'ST': 1},
+}
+
+
+# ways of picking parents: fitness-proportional draws, linear rank weights or k-way tournaments
+SELECTION_METHODS = ['tournament', 'rank', 'roulette']
+
+
+def parse_specific_players(pairs):
+    # DAId:position pairs (e.g. 415:CM 237:ST)
+    return {int(pair.split(':')[0]): pair.split(':')[1] for pair in pairs} if pairs else {}
+
+
+def parse_request(payload):
+    # squad request (as JSON, a batch scenario or service payload) -> (SquadSolver config, run options)
+    formation = payload.get('formation', '4-4-2')
+    if formation not in formations:
+        raise ValueError(f'Invalid formation "{formation}". Available formations are: {", ".join(formations.keys())}')
+    min_chemistry = int(payload.get('min_chemistry', 27))
+    if min_chemistry < 0 or min_chemistry > 33:
+        raise ValueError("Minimum chemistry must be between 0 and 33 inclusive.")
+    if payload.get('selection', 'tournament') not in SELECTION_METHODS:
+        raise ValueError(f'Invalid selection "{payload["selection"]}". Available methods are: {", ".join(SELECTION_METHODS)}')
+
+    specific_players = payload.get('specific_players') or {}
+    if isinstance(specific_players, dict):
+        specific_players_info = {int(DAId): position for DAId, position in specific_players.items()}
+    else:
+        specific_players_info = parse_specific_players(specific_players)
+
+    config = dict(formation=formations[formation], budget=int(payload.get('budget', 5000000)), min_chemistry=min_chemistry,
+                  specific_players_info=specific_players_info, greatest_squad=bool(payload.get('greatest_squad', False)),
+                  legend_squad=bool(payload.get('legend_squad', False)), elite_count=int(payload.get('elites', 2)),
+                  selection=payload.get('selection', 'tournament'), tournament_size=int(payload.get('tournament_size', 3)),
+                  prune_keep=None if payload.get('prune_keep') is None else int(payload['prune_keep']))
+    options = dict(generations=int(payload.get('generations', 1500)), seed=payload.get('seed'),
+                   patience=payload.get('patience'), min_diversity=payload.get('min_diversity'),
+                   target_fitness=payload.get('target_fitness'), time_limit=payload.get('time_limit'))
+    return config, options
+
+
+class StoppingCriteria:
+    # Ends a run early; every criterion is optional and the first one met wins
+    def __init__(self, patience=None, min_diversity=None, target_fitness=None, time_limit=None):
+        self.patience = patience
+        self.min_diversity = min_diversity
+        self.target_fitness = target_fitness
+        self.time_limit = time_limit
+        self.start()
+
+    def start(self):
+        self.started = time.monotonic()
+        self.best_fitness = None
+        self.best_generation = 0
+
+    def needs_fitness(self):
+        return self.patience is not None or self.target_fitness is not None
+
+    def remaining_time(self):
+        return None if self.time_limit is None else self.time_limit - (time.monotonic() - self.started)
+
+    def check(self, generation, best_fitness=None, diversity=None):
+        if best_fitness is not None and (self.best_fitness is None or best_fitness > self.best_fitness):
+            self.best_fitness = best_fitness
+            self.best_generation = generation
+        if self.target_fitness is not None and self.best_fitness is not None and self.best_fitness >= self.target_fitness:
+            return f'target fitness {self.target_fitness} reached'
+        if self.patience is not None and generation - self.best_generation >= self.patience:
+            return f'no improvement for {self.patience} generations'
+        if self.min_diversity is not None and diversity is not None and diversity < self.min_diversity:
+            return f'population diversity fell below {self.min_diversity}'
+        if self.time_limit is not None and time.monotonic() - self.started >= self.time_limit:
+            return f'time limit of {self.time_limit}s reached'
+        return None
+
+
+class SquadSolver:
+    def __init__(self, table, formation, budget, min_chemistry, specific_players_info=None,
+                 greatest_squad=False, legend_squad=False, population_size=100, seed=None, state=None, observers=None,
+                 elite_count=2, selection='tournament', tournament_size=3, fitness_cache_size=4096, prune_keep=None):
+        if min_chemistry < 0 or min_chemistry > 33:
+            raise ValueError("Minimum chemistry must be between 0 and 33 inclusive.")
+        if selection not in SELECTION_METHODS:
+            raise ValueError(f'Invalid selection "{selection}". Available methods are: {", ".join(SELECTION_METHODS)}')
+        if not 0 <= elite_count < population_size:
+            raise ValueError("The number of elites must be at least 0 and smaller than the population size.")
+
+        self.table = table
+        self.formation = formation
+        self.budget = budget
+        self.min_chemistry = min_chemistry
+        self.specific_players_info = specific_players_info or {}
+        self.greatest_squad = greatest_squad
+        self.legend_squad = legend_squad
+        self.population_size = population_size
+        self.elite_count = elite_count
+        self.selection = selection
+        self.tournament_size = tournament_size
+        self.random = random.Random(seed)
+        self.observers = list(observers or [])
+        self.last_phases = None
+        self.fitness_cache = FitnessCache(table, fitness_cache_size)
+        # outcome of each mutation scan (team signature, replaced player) -> new player or None; converged
+        # populations retry the same scans constantly
+        self.mutation_memo = collections.OrderedDict()
+        self.mutation_memo_size = fitness_cache_size
+
+        # Split specific players from the general pool of players
+        self.specific_players = {}
+        for index in range(len(table)):
+            if table.DAId[index] in self.specific_players_info:
+                self.specific_players[table.DAId[index]] = index
+        players = np.flatnonzero(~np.isin(table.DAId, list(self.specific_players_info)))
+
+        self.specific_players_cost = sum(table.cost[index] for index in self.specific_players.values())
+
+        # If greatest squad is to be generated, filter players and set minimum chemistry to 29
+        if greatest_squad:
+            players = players[(table.scores[players] > 98).any(axis=1)]
+            self.min_chemistry = 29
+        self.players = players
+
+        # Set the minimum score based on whether you are generating the greatest squad or not
+        if greatest_squad:
+            self.min_score = 98.75
+        elif legend_squad:
+            self.min_score = 97
+        else:
+            self.min_score = 89
+
+        # Index each player under every position they can play in; with prune_keep, dominated cards are left out
+        # (see position_index.dominated)
+        self.index = PositionIndex(table, players, self.min_score, prune_keep, None if greatest_squad else COST_PER_SCORE)
+
+        self.formation_ids = {table.position_ids[position]: count for position, count in formation.items()}
+        for position in formation:
+            if table.position_ids[position] not in self.index:
+                raise ValueError(f"No players can play the position {position}")
+
+        # pinned players take their slots first; the operators fill the open ones
+        for DAId, position in self.specific_players_info.items():
+            if position not in table.position_ids:
+                raise ValueError(f'Player {DAId} is pinned to an unknown position "{position}"')
+            if position not in formation:
+                raise ValueError(f'Player {DAId} is pinned to {position}, which the formation does not use. Its positions are: {", ".join(formation)}')
+        for position, count in collections.Counter(self.specific_players_info.values()).items():
+            if count > formation[position]:
+                raise ValueError(f'{count} players are pinned to {position}, but the formation has {formation[position]} {position} slot(s)')
+        self.pinned = [(player, table.position_ids[self.specific_players_info[DAId]]) for DAId, player in self.specific_players.items()]
+        self.open_slots = dict(self.formation_ids)
+        for _, position in self.pinned:
+            self.open_slots[position] -= 1
+
+        if state is None:
+            self.population = self.initial_population()
+        else:
+            self.load_state(state)
+
+    def update_prices(self, pool):
+        # Take new prices mid-run (see player_cache.apply_price_updates): reprice the table in place, rebuild (and
+        # re-prune) only the candidate views of the positions the repriced players can play and drop evaluations made
+        # at the old prices.
+        # Returns the table indices whose cost changed.
+        changed = self.table.update_costs(pool)
+        if len(changed):
+            self.index.update_costs(changed)
+            self.specific_players_cost = sum(self.table.cost[index] for index in self.specific_players.values())
+            self.fitness_cache.clear()
+            self.mutation_memo.clear()
+        return changed
+
+    def export_teams(self, teams):
+        # picklable (players, position ids) pairs
+        return [([int(player) for player in team.players], [int(position) for position in team.positions]) for team in teams]
+
+    def import_teams(self, teams):
+        return [Team(self.table, players, positions) for players, positions in teams]
+
+    def export_state(self):
+        return {'population': self.export_teams(self.population), 'random': self.random.getstate()}
+
+    def load_state(self, state):
+        self.population = self.import_teams(state['population'])
+        self.random.setstate(state['random'])
+
+    def export_elites(self, teams):
+        # teams as (pool row, position name) pairs, valid for any PlayerTable built from the same player data
+        table = self.table
+        return [[(int(table.rows[player]), table.positions[position]) for player, position in zip(team.players, team.positions)] for team in teams]
+
+    def import_elites(self, elites):
+        # the stored teams that are still valid for this request's pool, formation, pins, chemistry and budget
+        table = self.table
+        allowed = set(self.players.tolist()) | set(self.specific_players.values())
+        teams = []
+        for elite in elites:
+            rows = np.array([row for row, _ in elite])
+            players = np.searchsorted(table.rows, rows)
+            if (players >= len(table.rows)).any() or (table.rows[np.minimum(players, len(table.rows) - 1)] != rows).any():
+                continue  # some player is no longer in the pool
+            positions = [table.position_ids.get(position, -1) for _, position in elite]
+            if not set(players.tolist()) <= allowed or collections.Counter(positions) != collections.Counter(self.formation_ids):
+                continue
+            team = self.import_teams([(players.tolist(), positions)])[0]
+            if team.calculate_chemistry() >= self.min_chemistry and (self.greatest_squad or team.cost() <= self.budget):
+                teams.append(team)
+        return teams
+
+    def seed_population(self, elites):
+        # Warm start: replace the tail of the population with stored elite teams
+        seeded = self.import_elites(elites[:self.population_size])
+        if seeded:
+            self.population = self.population[:self.population_size - len(seeded)] + seeded
+        return len(seeded)
+
+    def fitness_values(self, teams, min_chemistry=None):
+        _, _, _, fitness = self.fitness_cache.evaluate(teams, self.mutation_budget(), self.min_chemistry if min_chemistry is None else min_chemistry,
+                                                       self.specific_players_cost)
+        return fitness
+
+    def top_teams(self, count):
+        # the fittest distinct squads in the population, best first
+        fitness = self.fitness_values(self.population, self.min_chemistry + 2)
+        teams, seen = [], set()
+        for i in np.argsort(-fitness, kind='stable'):
+            key = tuple(sorted(self.population[i].players))
+            if key not in seen:
+                seen.add(key)
+                teams.append(self.population[i])
+            if len(teams) == count:
+                break
+        return teams
+
+    def mutation_budget(self):
+        return None if self.greatest_squad else self.budget
+
+    def initial_population(self):
+        population = []
+        while len(population) < self.population_size:
+            team = random_team(self)
+            if team is None:
+                raise ValueError("Not enough distinct players to fill the formation")
+            if team.calculate_chemistry() >= self.min_chemistry:
+                population.append(team)
+        return population
+
+    def step(self):
+        # One generation. The best teams survive unchanged; the rest of the population is replaced by children
+        # (crossover, mutation, budget repair), and a child that breaks a rule is replaced by its fitter parent,
+        # so the population keeps its size and the best team is never lost.
+        phases = {} if self.observers else None
+        chemistry, fitness = self._run_phase(phases, 'fitness', self.evaluate)
+        if not (chemistry >= self.min_chemistry).any():
+            # no team meets the chemistry minimum (only possible without elites): start over from fresh random squads
+            self.population = self._run_phase(phases, 'restart', self.initial_population)
+            if phases is not None:
+                phases['restart']['teams'] = len(self.population)
+            self.last_phases = phases
+            return
+        elites = self.elites(chemistry, fitness)
+        children_needed = self.population_size - len(elites)
+        parents = self._run_phase(phases, 'selection', self.select_parents, fitness, 2 * children_needed)
+        children = self._run_phase(phases, 'crossover', self.crossover, parents)
+        mutations = self._run_phase(phases, 'mutation', self.mutate, children)
+        repairs = self._run_phase(phases, 'budget_repair', self.repair_budget, children)
+
+        fitness_of = {id(team): value for team, value in zip(self.population, fitness.tolist())}
+        fallbacks = [parent1 if fitness_of[id(parent1)] >= fitness_of[id(parent2)] else parent2
+                     for parent1, parent2 in zip(parents[::2], parents[1::2])]
+        survivors = self._run_phase(phases, 'dedupe', self.replace_invalid, children, fallbacks)
+        self.population = elites + survivors
+        if phases is not None:
+            phases['crossover']['teams'] = len(children)
+            phases['mutation']['swaps'] = mutations
+            phases['budget_repair']['iterations'] = repairs
+            phases['dedupe']['teams'] = len(self.population)
+            phases['dedupe']['replaced'] = sum(survivor is not child for survivor, child in zip(survivors, children))
+        self.last_phases = phases
+
+    def _run_phase(self, phases, name, function, *args):
+        if phases is None:
+            return function(*args)
+        allocations = Team.allocations
+        started = time.perf_counter()
+        result = function(*args)
+        phases[name] = {'seconds': time.perf_counter() - started, 'team_allocations': Team.allocations - allocations}
+        for observer in self.observers:
+            observer.phase_finished(self, name, phases[name])
+        return result
+
+    def evaluate(self):
+        # (chemistry, fitness) arrays for the population; also refreshes each team's cached chemistry
+        chemistry, _, _, fitness = self.fitness_cache.evaluate(self.population, self.budget, self.min_chemistry, self.specific_players_cost)
+        for team, team_chemistry in zip(self.population, chemistry):
+            team.chemistry = int(team_chemistry)
+        return chemistry, fitness
+
+    def elites(self, chemistry, fitness):
+        # the elite_count fittest distinct teams that meet the chemistry minimum, carried over unchanged
+        elites, seen = [], set()
+        for k in np.argsort(-fitness, kind='stable').tolist():
+            if len(elites) == self.elite_count or chemistry[k] < self.min_chemistry:
+                break
+            key = tuple(sorted(self.population[k].players))
+            if key not in seen:
+                seen.add(key)
+                elites.append(self.population[k])
+        return elites
+
+    def select_parents(self, fitness, count):
+        # count parents; teams below the chemistry minimum have fitness 0 and lose every comparison
+        population = self.population
+        if self.selection == 'tournament':
+            size = len(population)
+            parents = []
+            for _ in range(count):
+                contestants = [self.random.randrange(size) for _ in range(self.tournament_size)]
+                parents.append(population[max(contestants, key=lambda k: fitness[k])])
+            return parents
+        if self.selection == 'rank':
+            ranks = np.empty(len(population))
+            ranks[np.argsort(fitness, kind='stable')] = np.arange(1, len(population) + 1)
+            return self.random.choices(population, weights=ranks.tolist(), k=count)
+        return self.random.choices(population, weights=fitness.tolist(), k=count)
+
+    def crossover(self, parents):
+        # one child per pair of parents (see operators.uniform_crossover)
+        return [uniform_crossover(self, parent1, parent2) for parent1, parent2 in zip(parents[::2], parents[1::2])]
+
+    def mutate(self, population):
+        # at most one improving swap per team, in place; returns the number of swaps made
+        table = self.table
+        specific_ids = self.specific_players.keys()
+        budget = self.mutation_budget()
+        swaps = 0
+        for team in population:
+            if self.random.random() < 0.1:  # 10% mutation rate
+                old_player = self.random.choice([player for player in team.players if table.DAId[player] not in specific_ids])
+                position = team.position_of(old_player)
+                if position < 0 or position not in self.index:
+                    continue
+                key = (team.signature(), old_player)
+                if key in self.mutation_memo:
+                    self.mutation_memo.move_to_end(key)
+                    new_player = self.mutation_memo[key]
+                else:
+                    new_player = self._improving_swap(team, old_player, position, budget)
+                    self.mutation_memo[key] = new_player
+                    if len(self.mutation_memo) > self.mutation_memo_size:
+                        self.mutation_memo.popitem(last=False)
+                if new_player is not None:
+                    team.apply_swap(old_player, new_player, position)
+                    swaps += 1
+        return swaps
+
+    def _improving_swap(self, team, old_player, position, budget):
+        # the best-scoring replacement for old_player that improves the team's fitness, or None
+        table = self.table
+        names = {table.name_code[player] for player in team.players}
+
+        # Possible replacements, best score first, never a card already in the team; if we're not generating
+        # the greatest squad, consider the budget
+        max_cost = None if self.greatest_squad else table.cost[old_player]
+        possible_replacements = (player for player in self.index.best_by_score(position, max_cost) if table.name_code[player] not in names)
+
+        chemistry, performance, cost = self.fitness_cache.lookup(team)
+        current_fitness = team_fitness(chemistry, performance, cost, budget, self.min_chemistry, self.specific_players_cost)
+        for new_player in possible_replacements:
+            chemistry_delta, performance_delta, cost_delta = team.swap_delta(old_player, new_player, position)
+            new_chemistry = chemistry + chemistry_delta
+            if new_chemistry >= self.min_chemistry and team_fitness(new_chemistry, performance + performance_delta, cost + cost_delta, budget, self.min_chemistry, self.specific_players_cost) > current_fitness:
+                return new_player
+        return None
+
+    def repair_budget(self, population):
+        # bring over-budget teams under budget in place (see operators.greedy_repair); returns the number of trades made
+        if self.greatest_squad:
+            return 0
+        return sum(greedy_repair(self, team, self.budget) for team in population)
+
+    def is_valid(self, team):
+        # full squad of distinct cards that meets the chemistry minimum and, unless building the greatest squad, the budget
+        table = self.table
+        if len(team.players) != sum(self.formation_ids.values()) or len(set(table.name_code[player] for player in team.players)) != len(team.players):
+            return False
+        chemistry, _, cost = self.fitness_cache.lookup(team)
+        return chemistry >= self.min_chemistry and (self.greatest_squad or cost <= self.budget)
+
+    def replace_invalid(self, children, fallbacks):
+        # children that break a rule give way to a fresh copy of their fitter parent
+        survivors = []
+        for child, parent in zip(children, fallbacks):
+            if self.is_valid(child):
+                survivors.append(child)
+            else:
+                copy = Team(self.table, parent.players, parent.positions)
+                copy.chemistry = parent.chemistry
+                survivors.append(copy)
+        return survivors
+
+    def diversity(self):
+        # share of distinct squads in the population
+        if not self.population:
+            return 0
+        return len({tuple(sorted(team.players)) for team in self.population}) / len(self.population)
+
+    def run(self, generations, callback=None, stopping=None):
+        for _ in self.solve_iter(generations, callback, stopping):
+            pass
+        return self.best_team()
+
+    def solve_iter(self, generations, callback=None, stopping=None):
+        # Anytime version of run: yields (generation, best team) for the starting population and again whenever the
+        # best squad improves. Stop iterating to cancel the run.
+        self.stop_reason = f'{generations} generations completed'
+        self.generations_run = 0
+        if stopping is not None:
+            stopping.start()
+        for observer in self.observers:
+            observer.run_started(self)
+        try:
+            best_fitness, best = self._best()
+            if best_fitness > 0:
+                yield 0, best
+            for generation in range(generations):
+                if callback is not None:
+                    callback(generation)
+                self.step()
+                self.generations_run = generation + 1
+                if self.observers:
+                    self._report_generation(generation + 1)
+
+                fitness, team = self._best()
+                if fitness > best_fitness:
+                    best_fitness = fitness
+                    yield generation + 1, team
+
+                if stopping is not None:
+                    diversity = self.diversity() if stopping.min_diversity is not None else None
+                    reason = stopping.check(generation + 1, best_fitness, diversity)
+                    if reason is not None:
+                        self.stop_reason = reason
+                        break
+        except GeneratorExit:
+            self.stop_reason = f'cancelled after {self.generations_run} generations'
+            raise
+        finally:
+            for observer in self.observers:
+                observer.run_finished(self)
+
+    def _best(self):
+        # (fitness, team) of the best squad in the population, as chosen by best_team
+        fitness = self.fitness_values(self.population, self.min_chemistry + 2)
+        k = int(np.argmax(fitness))
+        return float(fitness[k]), self.population[k]
+
+    def _report_generation(self, generation):
+        # population statistics after a generation, passed to every observer with the phase timings
+        chemistry, _, _, fitness = self.fitness_cache.evaluate(self.population, self.budget, self.min_chemistry, self.specific_players_cost)
+        stats = {
+            'generation': generation,
+            'population': len(self.population),
+            'best_fitness': float(fitness.max(initial=0)),
+            'mean_fitness': float(fitness.mean()) if len(fitness) else 0.0,
+            'median_fitness': float(np.median(fitness)) if len(fitness) else 0.0,
+            'chemistry': np.bincount(np.asarray(chemistry, dtype=np.int64), minlength=34).tolist(),
+            'phases': self.last_phases,
+            'fitness_cache': self.fitness_cache.stats(),
+        }
+        for observer in self.observers:
+            observer.generation_finished(self, stats)
+
+    def best_team(self):
+        return self._best()[1]
+
+    def describe(self, team):
+        return describe_team(self.table, self.formation, team)
+
+    def summary(self, team):
+        # JSON-ready description of a team
+        return {
+            'team': [{'position': position, 'name': name, 'score': float(score), 'cost': float(cost)}
+                     for position, name, score, cost in self.describe(team)],
+            'fitness': float(team.fitness(self.mutation_budget(), self.min_chemistry)),
+            'cost': float(team.cost()),
+            'chemistry': int(team.calculate_chemistry()),
+        }
+
+
+def describe_team(table, formation, team):
+    # (position, name, score, cost) rows in formation order
+    rows = []
+    for position in formation:
+        position_id = table.position_ids[position]
+        for player, player_position in zip(team.players, team.positions):
+            if player_position == position_id:
+                rows.append((position, table.name[player], table.scores[player, position_id], table.cost[player]))
+    return rows
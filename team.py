@@ -1,65 +1,213 @@
 from collections import Counter
 
+import numpy as np
+
+# chemistry points for a group count, indexed by min(count, len - 1)
+CLUB_POINTS = (0, 0, 1, 1, 2, 2, 2, 3)  # 2+ / 4+ / 7+ teammates from the same club
+NATIONALITY_POINTS = (0, 0, 1, 1, 1, 2, 2, 2, 3)  # 2+ / 5+ / 8+
+LEAGUE_POINTS = (0, 0, 0, 1, 1, 2, 2, 2, 3)  # 3+ / 5+ / 8+
+
+
+def player_chemistry(same_club_count, same_nationality_count, same_league_count):
+    # each player's chemistry is capped at 3
+    return min(CLUB_POINTS[min(same_club_count, 7)]
+               + NATIONALITY_POINTS[min(same_nationality_count, 8)]
+               + LEAGUE_POINTS[min(same_league_count, 8)], 3)
+
+
+def team_fitness(chemistry, performance_score, cost, budget, min_chemistry, specific_players_cost=0):
+    if chemistry < min_chemistry:
+        return 0
+    team_cost = cost - specific_players_cost
+    budget_utilization = abs(budget - team_cost) if budget is not None else 0
+    return performance_score * 30 + chemistry * 225 - budget_utilization / 10000
+
+
 class Team:
-    def __init__(self, players):
-        self.players = players
-        self.club_counts = Counter(player.club for player in self.players)
-        self.nationality_counts = Counter(player.nationality for player in self.players)
-        self.league_counts = Counter(player.league for player in self.players)
-        self.chemistry = None  
+    allocations = 0  # teams built so far, read by the GA's instrumentation
+
+    def __init__(self, table, players, positions):
+        Team.allocations += 1
+        self.table = table
+        # the slot assignment: players[k] fills position id positions[k]. Both are tuples that are replaced, never
+        # edited, so a team's assignment is its own and can be read while other teams change
+        self.players = tuple(players)
+        self.positions = tuple(positions)
+        groups = [table.chemistry_groups[player] for player in self.players]
+        self.club_counts = Counter(club for club, _, _, _, _ in groups)
+        self.nationality_counts = Counter(nationality for _, nationality, _, _, _ in groups)
+        self.league_counts = Counter(league for _, _, league, _, _ in groups)
+        self.icon_nationality_counts = Counter(nationality for _, nationality, _, icon, _ in groups if icon)
+        self.hero_league_counts = Counter(league for _, _, league, _, hero in groups if hero)
+        self.chemistry = None
+        self._signature = None
 
     def cost(self):
-        return sum(player.cost for player in self.players)
+        return sum(self.table.cost[player] for player in self.players)
+
+    def performance_score(self):
+        return sum(self.table.scores[player, position] for player, position in zip(self.players, self.positions))
+
+    def position_of(self, player):
+        return self.positions[self.players.index(player)]
+
+    def signature(self):
+        # canonical form of the slot assignment: the sorted (player, position) pairs
+        if self._signature is None:
+            self._signature = tuple(sorted(zip(self.players, self.positions)))
+        return self._signature
+
+    def _player_chemistry(self, club, nationality, league, club_change=0, nationality_change=0, league_change=0):
+        return player_chemistry(
+            self.club_counts[club] + club_change,
+            self.nationality_counts[nationality] + 2 * self.icon_nationality_counts[nationality] + nationality_change,  # Icons count double
+            self.league_counts[league] + 2 * self.hero_league_counts[league] + league_change,  # Heroes count double
+        )
 
     def calculate_chemistry(self):
         if self.chemistry is not None:
             return self.chemistry
 
-        total_chemistry = 0
-        for player in self.players:
-            chem = 0
-
-            # calculate club chemistry
-            same_club_count = self.club_counts[player.club]
-            if same_club_count >= 7:
-                chem += 3
-            elif same_club_count >= 4:
-                chem += 2
-            elif same_club_count >= 2:
-                chem += 1
-
-            # calculate nationality chemistry
-            same_nationality_count = self.nationality_counts[player.nationality]
-            same_nationality_count += sum(2 for p in self.players if p.nationality == player.nationality and "FUT ICONS" in p.club)  # Icons count double
-            if same_nationality_count >= 8:
-                chem = min(chem + 3, 3)
-            elif same_nationality_count >= 5:
-                chem = min(chem + 2, 3)
-            elif same_nationality_count >= 2:
-                chem = min(chem + 1, 3)
-
-            # calculate league chemistry
-            same_league_count = self.league_counts[player.league]
-            same_league_count += sum(2 for p in self.players if p.league == player.league and "HERO" in p.club)  # Heroes count double
-            if same_league_count >= 8:
-                chem = min(chem + 3, 3)
-            elif same_league_count >= 5:
-                chem = min(chem + 2, 3)
-            elif same_league_count >= 3:
-                chem = min(chem + 1, 3)
-
-            total_chemistry += chem
-
-        self.chemistry = total_chemistry
-
-        return total_chemistry
+        groups = self.table.chemistry_groups
+        self.chemistry = sum(self._player_chemistry(*groups[player][:3]) for player in self.players)
+
+        return self.chemistry
 
     def fitness(self, budget, min_chemistry, specific_players_cost=0):
-        total_chemistry = self.calculate_chemistry()
-        if total_chemistry < min_chemistry:
-            return 0
-        performance_score = sum(player.performance_scores.get(player.selected_position, 0) for player in self.players)
-        team_cost = self.cost() - specific_players_cost
-        budget_utilization = abs(budget - team_cost) if budget is not None else 0 
-        return performance_score * 30 + total_chemistry * 225 - budget_utilization / 10000
+        return team_fitness(self.calculate_chemistry(), self.performance_score(), self.cost(), budget, min_chemistry, specific_players_cost)
+
+    @staticmethod
+    def _moved_groups(changes, counts, double_counts, points):
+        moved = set()
+        for group, change in changes.items():
+            if change:
+                count = counts[group] + (2 * double_counts[group] if double_counts is not None else 0)
+                if points[min(count, len(points) - 1)] != points[max(min(count + change, len(points) - 1), 0)]:
+                    moved.add(group)
+        return moved
+
+    def swap_delta(self, old_player, new_player, position=None):
+        # (chemistry, performance, cost) change from putting new_player in old_player's slot at position (by default
+        # the slot's current one), computed from the group counts without building a new Team
+        table = self.table
+        groups = table.chemistry_groups
+        old_club, old_nationality, old_league, old_icon, old_hero = groups[old_player]
+        new_club, new_nationality, new_league, new_icon, new_hero = groups[new_player]
+
+        # weighted count changes per group; icons/heroes count three times towards their nation/league
+        club_changes = {old_club: -1}
+        club_changes[new_club] = club_changes.get(new_club, 0) + 1
+        nationality_changes = {old_nationality: -3 if old_icon else -1}
+        nationality_changes[new_nationality] = nationality_changes.get(new_nationality, 0) + (3 if new_icon else 1)
+        league_changes = {old_league: -3 if old_hero else -1}
+        league_changes[new_league] = league_changes.get(new_league, 0) + (3 if new_hero else 1)
+
+        # only teammates whose group count crosses a points threshold change chemistry
+        club_moved = self._moved_groups(club_changes, self.club_counts, None, CLUB_POINTS)
+        nationality_moved = self._moved_groups(nationality_changes, self.nationality_counts, self.icon_nationality_counts, NATIONALITY_POINTS)
+        league_moved = self._moved_groups(league_changes, self.league_counts, self.hero_league_counts, LEAGUE_POINTS)
+
+        chemistry_delta = 0
+        if club_moved or nationality_moved or league_moved:
+            skipped = False
+            for player in self.players:
+                if not skipped and player == old_player:
+                    skipped = True
+                    continue
+                club, nationality, league = groups[player][:3]
+                if club in club_moved or nationality in nationality_moved or league in league_moved:
+                    chemistry_delta += (self._player_chemistry(club, nationality, league, club_changes.get(club, 0), nationality_changes.get(nationality, 0), league_changes.get(league, 0))
+                                        - self._player_chemistry(club, nationality, league))
+        chemistry_delta += (self._player_chemistry(new_club, new_nationality, new_league, club_changes[new_club], nationality_changes[new_nationality], league_changes[new_league])
+                            - self._player_chemistry(old_club, old_nationality, old_league))
+
+        old_position = self.position_of(old_player)
+        new_position = old_position if position is None else position
+        performance_delta = table.scores[new_player, new_position] - table.scores[old_player, old_position]
+        cost_delta = table.cost[new_player] - table.cost[old_player]
+        return chemistry_delta, performance_delta, cost_delta
+
+    def apply_swap(self, old_player, new_player, position=None):
+        # replace old_player in place, updating the group counts and cached chemistry incrementally
+        table = self.table
+        if self.chemistry is not None:
+            self.chemistry += self.swap_delta(old_player, new_player, position)[0]
+
+        for player, sign in ((old_player, -1), (new_player, 1)):
+            club, nationality, league, icon, hero = table.chemistry_groups[player]
+            self.club_counts[club] += sign
+            self.nationality_counts[nationality] += sign
+            self.league_counts[league] += sign
+            if icon:
+                self.icon_nationality_counts[nationality] += sign
+            if hero:
+                self.hero_league_counts[league] += sign
+
+        k = self.players.index(old_player)
+        self._signature = None
+        self.players = self.players[:k] + (new_player,) + self.players[k + 1:]
+        if position is not None:
+            self.positions = self.positions[:k] + (position,) + self.positions[k + 1:]
+
+    def exchange_positions(self, player1, player2):
+        # the two players swap slots; chemistry and cost don't depend on positions, so only the assignment changes
+        positions = list(self.positions)
+        k1, k2 = self.players.index(player1), self.players.index(player2)
+        positions[k1], positions[k2] = positions[k2], positions[k1]
+        self.positions = tuple(positions)
+        self._signature = None
+
+
+def population_matrix(population):
+    # (len(population) x width) player indices and their position ids, padded with -1 for teams with fewer players
+    width = max((len(team.players) for team in population), default=0)
+    players = np.full((len(population), width), -1, dtype=np.int64)
+    positions = np.full((len(population), width), -1, dtype=np.int64)
+    for row, team in enumerate(population):
+        players[row, :len(team.players)] = team.players
+        positions[row, :len(team.positions)] = team.positions
+    return players, positions
+
+
+def _group_counts(codes, valid, weights=None):
+    # per-slot count of teammates sharing the slot's group code (-1 codes are shifted to 0)
+    rows, width = codes.shape
+    groups = codes.max(initial=-1) + 2
+    flat = (np.arange(rows)[:, None] * groups + codes + 1)[valid]
+    counts = np.bincount(flat, weights=None if weights is None else weights[valid], minlength=rows * groups)
+    return counts.reshape(rows, groups)[np.arange(rows)[:, None], codes + 1]
+
+
+def _chemistry_points(counts, thresholds):
+    return (counts >= thresholds[0]).astype(np.int64) + (counts >= thresholds[1]) + (counts >= thresholds[2])
+
+
+def evaluate_population(table, players, positions, budget, min_chemistry, specific_players_cost=0):
+    # Batch version of Team.calculate_chemistry / Team.fitness for (teams x slots) player and position id matrices
+    players = np.asarray(players)
+    valid = players >= 0
+    safe = np.where(valid, players, 0)
+    positions = np.where(valid, positions, -1)
+
+    club = np.where(valid, table.club[safe], -1)
+    nationality = np.where(valid, table.nationality[safe], -1)
+    league = np.where(valid, table.league[safe], -1)
+
+    club_counts = _group_counts(club, valid)
+    nationality_counts = _group_counts(nationality, valid) + 2 * _group_counts(nationality, valid, table.is_icon[safe].astype(np.int64))  # Icons count double
+    league_counts = _group_counts(league, valid) + 2 * _group_counts(league, valid, table.is_hero[safe].astype(np.int64))  # Heroes count double
+
+    chem = (_chemistry_points(club_counts, (2, 4, 7))
+            + _chemistry_points(nationality_counts, (2, 5, 8))
+            + _chemistry_points(league_counts, (3, 5, 8)))
+    chemistry = np.where(valid, np.minimum(chem, 3), 0).sum(axis=1)
+
+    performance = np.where(valid, table.scores[safe, positions], 0).sum(axis=1)
+    cost = np.where(valid, table.cost[safe], 0).sum(axis=1)
+    return chemistry, performance, cost, population_fitness(chemistry, performance, cost, budget, min_chemistry, specific_players_cost)
+
 
+def population_fitness(chemistry, performance, cost, budget, min_chemistry, specific_players_cost=0):
+    # team_fitness over arrays
+    budget_utilization = np.abs(budget - (cost - specific_players_cost)) if budget is not None else 0
+    return np.where(chemistry < min_chemistry, 0, performance * 30 + chemistry * 225 - budget_utilization / 10000)
@@ -0,0 +1,60 @@
+import numpy as np
+
+import local_search
+from local_search import polish
+from solver import SquadSolver, formations
+from team import Team
+
+FLOOR = 97  # the legend squad's minimum score
+
+
+def floor_breaking_exchange(table, formation):
+    # two cards above the floor in two of the formation's positions whose exchange raises the performance score
+    # but leaves one of them at or below the floor: (player1, position1, player2, position2)
+    ids = [table.position_ids[position] for position in formation]
+    for position1 in ids:
+        for position2 in ids:
+            if position1 == position2:
+                continue
+            both = np.flatnonzero(table.can_play[:, position1] & table.can_play[:, position2]).tolist()
+            for player1 in both:
+                for player2 in both:
+                    if (player1 == player2 or table.name_code[player1] == table.name_code[player2]
+                            or min(table.scores[player1, position1], table.scores[player2, position2]) <= FLOOR):
+                        continue
+                    exchanged = (table.scores[player1, position2], table.scores[player2, position1])
+                    if (sum(exchanged) > table.scores[player1, position1] + table.scores[player2, position2]
+                            and min(exchanged) <= FLOOR):
+                        return player1, position1, player2, position2
+    return None
+
+
+def test_polish_exchanges_keep_the_score_floor(table, monkeypatch):
+    formation = formations['4-4-2']
+    exchange = floor_breaking_exchange(table, formation)
+    assert exchange is not None
+    player1, position1, player2, position2 = exchange
+
+    # fill the other slots with the best remaining cards above the floor and pin them, so only the pair can move
+    players, positions = [player1, player2], [position1, position2]
+    names = {table.name_code[player1], table.name_code[player2]}
+    open_slots = {table.position_ids[position]: count for position, count in formation.items()}
+    open_slots[position1] -= 1
+    open_slots[position2] -= 1
+    for position, count in open_slots.items():
+        for player in np.argsort(-table.scores[:, position], kind='stable').tolist()[:200]:
+            if count and table.can_play[player, position] and table.name_code[player] not in names and table.scores[player, position] > FLOOR:
+                players.append(player)
+                positions.append(position)
+                names.add(table.name_code[player])
+                count -= 1
+    team = Team(table, players, positions)
+    pins = {int(table.DAId[player]): table.positions[position] for player, position in zip(players[2:], positions[2:])}
+    solver = SquadSolver(table, formation, team.cost(), 0, specific_players_info=pins, legend_squad=True, seed=1, population_size=4)
+    assert solver.min_score == FLOOR
+
+    # exchanges only: without a floor check the first step would take the pair's exchange
+    monkeypatch.setattr(local_search, '_replacements', lambda *args: [])
+    polished, _ = polish(solver, team, 10, max_iterations=5)
+    assert all(table.scores[player, position] > FLOOR for player, position in zip(polished.players, polished.positions))
+    assert polished.signature() == team.signature()
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from observers import Observer
+from pareto import non_dominated_ranks, solve_pareto
+from solver import SquadSolver, StoppingCriteria, formations
+
+
+class Recorder(Observer):
+    def __init__(self):
+        self.stats = []
+
+    def generation_finished(self, solver, stats):
+        self.stats.append(stats)
+
+
+def pareto_solver(table, observers=None):
+    return SquadSolver(table, formations['4-4-2'], 3000000, 27, seed=2, population_size=20, observers=observers)
+
+
+def test_pareto_rejects_a_target_fitness(table):
+    with pytest.raises(ValueError, match='no single fitness'):
+        solve_pareto(pareto_solver(table), 5, stopping=StoppingCriteria(target_fitness=1000))
+
+
+def test_pareto_front_is_feasible_and_non_dominated(table):
+    recorder = Recorder()
+    solver = pareto_solver(table, [recorder])
+    front = solve_pareto(solver, 5)
+
+    assert front
+    costs = [team.cost() for team in front]
+    assert costs == sorted(costs) and costs[-1] <= solver.budget
+    assert all(team.calculate_chemistry() >= solver.min_chemistry for team in front)
+    values = np.array([[team.cost(), -team.performance_score(), -team.calculate_chemistry()] for team in front])
+    assert (non_dominated_ranks(values) == 0).all()
+    assert [stats['generation'] for stats in recorder.stats] == [1, 2, 3, 4, 5]
@@ -0,0 +1,168 @@
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from checkpoint import load_checkpoint, save_checkpoint
+from player import SCORE_COLUMNS
+from solver import SquadSolver, formations
+from team import Team, evaluate_population, population_matrix
+
+# Parity checks of the columnar Team against the original object-based scoring rules, and a check that a run
+# resumed from a checkpoint ends where the uninterrupted run does.
+
+
+class ReferencePlayer:
+    def __init__(self, club, nationality, league, cost, performance_scores, selected_position):
+        self.club = club
+        self.nationality = nationality
+        self.league = league
+        self.cost = cost
+        self.performance_scores = performance_scores
+        self.selected_position = selected_position
+
+
+class ReferenceTeam:
+    # the chemistry and fitness rules as they were before the player table, kept verbatim
+    def __init__(self, players):
+        self.players = players
+        self.club_counts = Counter(player.club for player in self.players)
+        self.nationality_counts = Counter(player.nationality for player in self.players)
+        self.league_counts = Counter(player.league for player in self.players)
+
+    def cost(self):
+        return sum(player.cost for player in self.players)
+
+    def calculate_chemistry(self):
+        total_chemistry = 0
+        for player in self.players:
+            chem = 0
+
+            same_club_count = self.club_counts[player.club]
+            if same_club_count >= 7:
+                chem += 3
+            elif same_club_count >= 4:
+                chem += 2
+            elif same_club_count >= 2:
+                chem += 1
+
+            same_nationality_count = self.nationality_counts[player.nationality]
+            same_nationality_count += sum(2 for p in self.players if p.nationality == player.nationality and "FUT ICONS" in p.club)
+            if same_nationality_count >= 8:
+                chem = min(chem + 3, 3)
+            elif same_nationality_count >= 5:
+                chem = min(chem + 2, 3)
+            elif same_nationality_count >= 2:
+                chem = min(chem + 1, 3)
+
+            same_league_count = self.league_counts[player.league]
+            same_league_count += sum(2 for p in self.players if p.league == player.league and "HERO" in p.club)
+            if same_league_count >= 8:
+                chem = min(chem + 3, 3)
+            elif same_league_count >= 5:
+                chem = min(chem + 2, 3)
+            elif same_league_count >= 3:
+                chem = min(chem + 1, 3)
+
+            total_chemistry += chem
+        return total_chemistry
+
+    def fitness(self, budget, min_chemistry, specific_players_cost=0):
+        total_chemistry = self.calculate_chemistry()
+        if total_chemistry < min_chemistry:
+            return 0
+        performance_score = sum(player.performance_scores.get(player.selected_position, 0) for player in self.players)
+        team_cost = self.cost() - specific_players_cost
+        budget_utilization = abs(budget - team_cost) if budget is not None else 0
+        return performance_score * 30 + total_chemistry * 225 - budget_utilization / 10000
+
+
+def reference_player(pool, table, player, position):
+    # the spreadsheet's raw values for a table row, read from the pool rather than the table's derived arrays
+    row = table.rows[player]
+
+    def category(column):
+        code = int(pool.codes[column][row])
+        return pool.categories[column][code] if code >= 0 else None
+
+    scores = {name: float(pool.columns[column][row]) for name, column in SCORE_COLUMNS.items()}
+    return ReferencePlayer(category('Club') or '', category('Nationality'), category('League'),
+                           float(pool.columns['Cost'][row]), scores, table.positions[position])
+
+
+def random_squads(table, count, seed=0):
+    # squads of 11 on the 4-4-2 slots; most draw from a handful of clubs, nations or leagues so the chemistry
+    # thresholds are reached, the rest are uniform
+    rng = random.Random(seed)
+    slots = [table.position_ids[position] for position, n in formations['4-4-2'].items() for _ in range(n)]
+    groups = [table.club, table.nationality, table.league]
+    squads = []
+    for k in range(count):
+        if k % 4 == 0:
+            candidates = range(len(table))
+        else:
+            codes = groups[k % 3]
+            chosen = rng.sample(sorted(set(codes[rng.sample(range(len(table)), 3)].tolist())), 1)
+            candidates = np.flatnonzero(np.isin(codes, chosen)).tolist()
+            if len(candidates) < 11:
+                candidates = range(len(table))
+        squads.append((rng.sample(list(candidates), 11), slots))
+    return squads
+
+
+@pytest.mark.parametrize('budget', [3000000, None])
+def test_scoring_matches_reference(pool, table, budget):
+    squads = random_squads(table, 300)
+    teams = [Team(table, players, positions) for players, positions in squads]
+    reference = [ReferenceTeam([reference_player(pool, table, player, position) for player, position in zip(players, positions)])
+                 for players, positions in squads]
+    chemistry, performance, cost, fitness = evaluate_population(table, *population_matrix(teams), budget, 20, 0)
+
+    assert max(chemistry) > 20
+    for k, (team, expected) in enumerate(zip(teams, reference)):
+        assert team.calculate_chemistry() == expected.calculate_chemistry()
+        assert chemistry[k] == expected.calculate_chemistry()
+        assert cost[k] == expected.cost()
+        assert team.fitness(budget, 20) == pytest.approx(expected.fitness(budget, 20))
+        assert fitness[k] == pytest.approx(expected.fitness(budget, 20))
+
+
+def test_swap_delta_matches_rebuilt_team(table):
+    rng = random.Random(1)
+    for players, positions in random_squads(table, 100, seed=1):
+        team = Team(table, players, positions)
+        k = rng.randrange(len(players))
+        new_player = rng.choice([player for player in range(len(table)) if player not in players])
+        new_position = rng.choice([None, positions[(k + 1) % len(positions)]])
+        swapped = Team(table, players[:k] + [new_player] + players[k + 1:],
+                       positions[:k] + [positions[k] if new_position is None else new_position] + positions[k + 1:])
+
+        chemistry_delta, performance_delta, cost_delta = team.swap_delta(players[k], new_player, new_position)
+        assert chemistry_delta == swapped.calculate_chemistry() - team.calculate_chemistry()
+        assert performance_delta == pytest.approx(swapped.performance_score() - team.performance_score())
+        assert cost_delta == swapped.cost() - team.cost()
+
+        team.calculate_chemistry()
+        team.apply_swap(players[k], new_player, new_position)
+        assert team.signature() == swapped.signature()
+        assert team.calculate_chemistry() == swapped.calculate_chemistry()
+
+
+def test_resume_matches_uninterrupted_run(pool, table, tmp_path):
+    config = dict(formation=formations['4-4-2'], budget=3000000, min_chemistry=27, specific_players_info={})
+    generations, interrupted_at, seed = 20, 8, 7
+
+    uninterrupted = SquadSolver(table, **config, seed=seed)
+    best = uninterrupted.run(generations)
+
+    first = SquadSolver(table, **config, seed=seed)
+    first.run(interrupted_at)
+    path = str(tmp_path / 'checkpoint.npz')
+    save_checkpoint(path, first, config, pool.data_version, interrupted_at, generations, seed)
+    resumed_config, state, meta = load_checkpoint(path, table, pool.data_version)
+    resumed = SquadSolver(table, **resumed_config, seed=meta['seed'], state=state)
+    resumed_best = resumed.run(meta['generations'] - meta['generation'])
+
+    assert resumed_best.signature() == best.signature()
+    assert [team.signature() for team in resumed.population] == [team.signature() for team in uninterrupted.population]
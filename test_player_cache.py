@@ -0,0 +1,37 @@
+import numpy as np
+
+from player import PlayerTable
+from player_cache import apply_price_updates, data_stamp, load_player_pool
+
+SOURCE_PATH = 'players_price_update.xlsx'
+
+
+def test_price_feeds_change_the_data_version(tmp_path):
+    pool = load_player_pool(SOURCE_PATH, cache_dir=tmp_path)
+    assert pool.data_version == pool.source_hash
+    stamp = data_stamp(SOURCE_PATH, pool.source_hash, cache_dir=tmp_path)
+    DAId = int(pool.columns['DAId'][0])
+    cost = float(pool.columns['Cost'][0])
+
+    updated, changed, unknown = apply_price_updates(SOURCE_PATH, {DAId: cost + 1000, -1: 5}, cache_dir=tmp_path)
+    assert unknown == [-1]
+    assert np.asarray(updated.columns['Cost'])[changed].tolist() == [cost + 1000] * len(changed)
+    assert updated.data_version.startswith(pool.source_hash + '+')
+    assert data_stamp(SOURCE_PATH, pool.source_hash, cache_dir=tmp_path) != stamp
+    # readers loading the pool afterwards see the new prices under the same version
+    assert load_player_pool(SOURCE_PATH, cache_dir=tmp_path).data_version == updated.data_version
+
+    # a feed that changes nothing keeps the version
+    same, changed, _ = apply_price_updates(SOURCE_PATH, {DAId: cost + 1000}, cache_dir=tmp_path)
+    assert len(changed) == 0 and same.data_version == updated.data_version
+
+
+def test_tables_take_repriced_costs(tmp_path):
+    pool = load_player_pool(SOURCE_PATH, cache_dir=tmp_path)
+    table = PlayerTable(pool, min_cost=15000)
+    DAId = int(table.DAId[0])
+    updated, _, _ = apply_price_updates(SOURCE_PATH, {DAId: float(table.cost[0]) * 2}, cache_dir=tmp_path)
+
+    changed = table.update_costs(updated)
+    assert changed.tolist() == np.flatnonzero(table.DAId == DAId).tolist()
+    assert table.cost.tolist() == PlayerTable(updated, min_cost=15000).cost.tolist()
@@ -0,0 +1,16 @@
+import random
+
+import numpy as np
+
+from position_index import PositionIndex
+
+
+def test_best_by_score_matches_a_filtered_scan(table):
+    index = PositionIndex(table, np.arange(len(table)), 89)
+    rng = random.Random(0)
+    for position in index.positions():
+        costs = index.sorted_costs[position]
+        for max_cost in [None, costs[0] - 1, costs[0], costs[-1]] + [rng.choice(costs) for _ in range(5)] + [rng.uniform(costs[0], costs[-1])]:
+            expected = [player for player in index.by_score[position] if max_cost is None or table.cost[player] <= max_cost]
+            assert list(index.best_by_score(position, max_cost)) == expected
+    assert list(index.best_by_score(-5, 1000000)) == []
@@ -0,0 +1,36 @@
+from result_cache import ResultCache, run_settings
+from solver import formations
+
+CONFIG = dict(formation=formations['4-4-2'], budget=3000000, min_chemistry=27, specific_players_info={})
+RESULT = {'fitness': 1.0, 'cost': 2900000.0, 'chemistry': 30, 'team': []}
+ELITES = [[(0, 'GK')]]
+
+
+def test_entries_are_keyed_on_the_data_version(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'))
+    settings = run_settings(100, seed=1)
+    cache.put(CONFIG, 'source', RESULT, ELITES, settings)
+
+    assert cache.get(CONFIG, 'source', settings)['result'] == RESULT
+    # new prices or a new spreadsheet are a miss
+    assert cache.get(CONFIG, 'source+prices', settings) is None
+    assert cache.get(CONFIG, 'other', settings) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    # and so is the same request solved another way
+    assert cache.get(CONFIG, 'source', run_settings(100, seed=2)) is None
+    assert cache.get(CONFIG, 'source', run_settings(100, seed=1, solver='exact')) is None
+
+    # entries outlive the process that stored them
+    reopened = ResultCache(str(tmp_path / 'results.sqlite'))
+    assert reopened.get(CONFIG, 'source', settings)['elites'] == [[[0, 'GK']]]
+
+
+def test_warm_starts_cross_price_versions_but_not_spreadsheets(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'))
+    cache.put(CONFIG, 'source+old', RESULT, ELITES, run_settings(100))
+
+    close = dict(CONFIG, budget=3050000)
+    assert cache.near(close, 'source+new') == [[[0, 'GK']]]
+    assert cache.near(close, 'source') == [[[0, 'GK']]]
+    assert cache.near(close, 'other') == []
+    assert cache.near(dict(CONFIG, budget=4000000), 'source+new') == []
@@ -0,0 +1,37 @@
+import pytest
+
+from solver import SquadSolver, formations
+
+
+def pinned_solver(table, pins, formation='4-4-2'):
+    return SquadSolver(table, formations[formation], 3000000, 0, specific_players_info=pins, seed=1, population_size=10)
+
+
+def cards_at(table, position, count):
+    # DAIds of the first count distinct cards that can play position
+    position_id = table.position_ids[position]
+    DAIds = dict.fromkeys(int(table.DAId[player]) for player in range(len(table)) if table.can_play[player, position_id])
+    return list(DAIds)[:count]
+
+
+@pytest.mark.parametrize('position, message', [
+    ('XX', 'unknown position'),
+    ('CAM', 'which the formation does not use'),
+])
+def test_pins_outside_the_formation_are_rejected(table, position, message):
+    with pytest.raises(ValueError, match=message):
+        pinned_solver(table, {int(table.DAId[0]): position})
+
+
+def test_more_pins_than_slots_are_rejected(table):
+    pins = {DAId: 'ST' for DAId in cards_at(table, 'ST', 3)}
+    with pytest.raises(ValueError, match='3 players are pinned to ST'):
+        pinned_solver(table, pins)
+
+
+def test_pinned_squads_have_eleven_players(table):
+    pins = {DAId: 'ST' for DAId in cards_at(table, 'ST', 2)}
+    solver = pinned_solver(table, pins)
+    best = solver.run(5)
+    assert len(best.players) == 11
+    assert all(solver.specific_players[DAId] in best.players for DAId in pins)
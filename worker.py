@@ -0,0 +1,54 @@
+import numpy as np
+
+from player import PlayerTable
+from player_cache import load_player_pool
+from result_cache import ELITE_COUNT
+from solver import SquadSolver, StoppingCriteria
+
+# each worker process loads the memory-mapped player cache once and reuses it for every task it runs
+_table = None
+_source_path = None
+_data_version = None
+
+
+def init_worker(source_path, min_cost):
+    global _table, _source_path, _data_version
+    pool = load_player_pool(source_path)
+    _table = PlayerTable(pool, min_cost=min_cost)
+    _source_path, _data_version = source_path, pool.data_version
+
+
+def _refresh_prices(data_version):
+    # pick up a price feed applied since this worker loaded the pool
+    global _data_version
+    if data_version is not None and data_version != _data_version:
+        pool = load_player_pool(_source_path)
+        _table.update_costs(pool)
+        _data_version = pool.data_version
+
+
+def evolve(config, seed, state, generations, target_fitness=None, time_limit=None, elites=None, data_version=None):
+    # Run one epoch of a solver whose population travels between processes in `state`;
+    # a fresh run (no state) can be warm-started from stored elites. data_version is the pool version the
+    # caller expects, so workers reprice their table when a price feed landed in between.
+    _refresh_prices(data_version)
+    solver = SquadSolver(_table, **config, seed=seed, state=state)
+    if state is None and elites:
+        solver.seed_population(elites)
+    stopping = StoppingCriteria(target_fitness=target_fitness, time_limit=time_limit) if target_fitness is not None or time_limit is not None else None
+    solver.run(generations, stopping=stopping)
+
+    # hand the population back best-first so callers can take elites from the front and replace from the back
+    fitness = solver.fitness_values(solver.population)
+    solver.population = [solver.population[i] for i in np.argsort(-fitness, kind='stable')]
+    best = solver.best_team()
+    return {
+        'state': solver.export_state(),
+        'best': solver.export_teams([best])[0],
+        'best_fitness': float(solver.fitness_values([best], solver.min_chemistry + 2)[0]),
+        'summary': solver.summary(best),
+        'elites': solver.export_elites(solver.top_teams(ELITE_COUNT)),
+        'diversity': solver.diversity(),
+        'generations_run': solver.generations_run,
+        'stop_reason': solver.stop_reason if solver.generations_run < generations else None,
+    }